@@ -1,28 +1,20 @@
-import yfinance as yf
-from gnews import GNews
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.linear_model import LogisticRegression
-import numpy as np
 import pandas as pd
 import streamlit as st
 import datetime
 import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.preprocessing import MinMaxScaler
 from ta.momentum import RSIIndicator
 from ta.trend import SMAIndicator, MACD
 import logging
 import plotly.express as px
 import matplotlib.pyplot as plt
-import tensorflow as tf
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout, BatchNormalization
-from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.stattools import adfuller, acf
-from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from statsmodels.tsa.stattools import adfuller
+from data_store import get_bars, get_bars_batch
+from market_data import fetch_index_snapshots, get_intraday_bars, get_ticker_info
+from training import ENGINES, prepare_features
+from forecasting import cached_forecast
+from app_helpers import (build_acf_figure, build_decomposition_figure, build_forecast_figure, build_price_figure,
+                         fetch_news_sentiment, registered_model, session_result)
 
 
 # Initialize logging
@@ -64,11 +56,11 @@ option = st.sidebar.selectbox("Choose Analysis", (
 ))
 
 
-@st.cache_data(ttl=3600)
 def fetch_stock_data(symbol, start_date, end_date):
     """Fetch historical stock data for a specific symbol within a date range."""
     try:
-        data = yf.download(symbol, start=start_date, end=end_date)
+        # Sliced from the shared range cache, only missing edges are loaded
+        data = get_bars(symbol, start_date, end_date)
         if data.empty:
             st.warning(f"No data available for {symbol} between {start_date} and {end_date}.")
         return data
@@ -77,6 +69,19 @@ def fetch_stock_data(symbol, start_date, end_date):
         return pd.DataFrame()
 
 
+def fetch_stock_data_batch(symbols, start_date, end_date):
+    """Fetch historical stock data for several symbols with one grouped download."""
+    try:
+        data = get_bars_batch(symbols, start_date, end_date)
+        for symbol, df in data.items():
+            if df.empty:
+                st.warning(f"No data available for {symbol} between {start_date} and {end_date}.")
+        return data
+    except Exception as e:
+        st.error(f"Error fetching data: {str(e)}")
+        return {symbol: pd.DataFrame() for symbol in symbols}
+
+
 def fetch_market_data():
     """Retrieve current data for major market indices."""
     indices = {
@@ -86,23 +91,8 @@ def fetch_market_data():
         "Nikkei 225": "^N225",
         "Dow Jones": "^DJI"
     }
-    market_data = {}
-    for name, symbol in indices.items():
-        try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
-            if not data.empty:
-                close_price = data['Close'].iloc[-1]
-                change = close_price - data['Open'].iloc[0]
-                percent_change = (change / data['Open'].iloc[0]) * 100
-                market_data[name] = {
-                    "price": close_price,
-                    "change": change,
-                    "percent_change": percent_change
-                }
-        except Exception as e:
-            st.error(f"Error fetching data for {name}: {str(e)}")
-    return market_data
+    # Fetched concurrently, indices that miss the deadline come back degraded
+    return fetch_index_snapshots(indices)
 
 
 def display_market_interface(market_data):
@@ -110,14 +100,17 @@ def display_market_interface(market_data):
     cols = st.columns(len(market_data))
     for i, (name, data) in enumerate(market_data.items()):
         with cols[i]:
-            st.metric(label=name, value=f"{data['price']:.2f}", delta=f"{data['change']:.2f} ({data['percent_change']:.2f}%)")
+            if data.get("degraded"):
+                st.metric(label=name, value="N/A", delta=data['error'], delta_color="off")
+            else:
+                st.metric(label=name, value=f"{data['price']:.2f}", delta=f"{data['change']:.2f} ({data['percent_change']:.2f}%)")
     
-    # Fetch overall market Intraday Data
-    nifty_data = yf.download('^NSEI', period='1d', interval='5m')
-    sensex_data = yf.download('^BSESN', period='1d', interval='5m')
-    niftybank_data = yf.download('^NSEBANK', period='1d', interval='5m')
-    Nikkei225_data = yf.download('^N225', period='1d', interval='5m')
-    dowJones_data = yf.download('^DJI', period='1d', interval='5m')
+    # Read overall market Intraday Data from the shared background-refreshed cache
+    nifty_data = get_intraday_bars('^NSEI')
+    sensex_data = get_intraday_bars('^BSESN')
+    niftybank_data = get_intraday_bars('^NSEBANK')
+    Nikkei225_data = get_intraday_bars('^N225')
+    dowJones_data = get_intraday_bars('^DJI')
     
     if not nifty_data.empty:
         # Apply a rolling average for better smoothing
@@ -325,38 +318,19 @@ def display_market_interface(market_data):
         st.plotly_chart(fig)
 
 
-def fetch_news_sentiment(symbol):
-    """Fetch news and analyze sentiment for a given stock symbol."""
-    try:
-        gnews = GNews(language='en', country='IN', max_results=10)
-        news = gnews.get_news(symbol)
-        sentiment_analyzer = SentimentIntensityAnalyzer()
-        sentiments = []
-        
-        st.write("\nLatest News and Sentiments:")
-        st.write("--------------------------------------------------")
-        
-        for article in news:
-            title = article['title']
-            sentiment_score = sentiment_analyzer.polarity_scores(title)['compound']
-            sentiments.append(sentiment_score)
-            sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-            st.write(f"Title: {title}\nSentiment: {sentiment_label} (Score: {sentiment_score:.2f})\n")
-        
-        avg_sentiment = np.mean(sentiments) if sentiments else 0
-        overall_sentiment = "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral"
-        
-        st.write("--------------------------------------------------")
-        st.write(f"Overall Sentiment: {overall_sentiment} (Score: {avg_sentiment:.2f})")
-    except Exception as e:
-        st.error(f"Error in sentiment analysis: {str(e)}")
+# Engines the prediction page can forecast with, and their sidebar labels
+forecast_engines = {
+    "logistic": "Logistic Regression",
+    "online_logistic": "Online Logistic Regression (SGD)",
+    "direct": "Direct multi-horizon LSTM"
+}
 
 
-def gyaani_baba_prediction(symbol, days=120):
+def gyaani_baba_prediction(symbol, days=120, engine="logistic"):
     """Predict future stock prices using Logistic Regression with calibration."""
     try:
-        # Fetch stock data for the past two years instead of one
-        start_date = datetime.date.today() - pd.DateOffset(years=2)
+        # Fetch the engine's history, two years for Logistic Regression
+        start_date = datetime.date.today() - pd.DateOffset(years=ENGINES[engine]["history_years"])
         end_date = datetime.date.today()
         data = fetch_stock_data(symbol, start_date, end_date)
 
@@ -365,106 +339,24 @@ def gyaani_baba_prediction(symbol, days=120):
             return None
 
         # Prepare data for model - create feature dataframe
-        df = pd.DataFrame()
-        df['Open'] = data['Open']
-        df['High'] = data['High']
-        df['Low'] = data['Low']
-        df['Close'] = data['Close']
-        df['Volume'] = data['Volume']
-
-        # Calculate technical indicators
-        df['SMA_5'] = df['Close'].rolling(window=5).mean()
-        df['SMA_20'] = df['Close'].rolling(window=20).mean()
-
-        # Add price momentum features
-        df['Price_Change'] = df['Close'].pct_change()
-        df['Price_Change_5d'] = df['Close'].pct_change(5)
-
-        # Remove NaN values
-        df = df.dropna()
-
-        # Store closing prices for later use
-        close_prices = df[['Close']].values
-
-        # Normalize all data
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(df)
-
-        # Create a separate scaler just for Close prices
-        close_scaler = MinMaxScaler(feature_range=(0, 1))
-        close_prices_scaled = close_scaler.fit_transform(close_prices)
-
-        # Find the index of Close price in the feature set
-        close_index = list(df.columns).index('Close')
-
-        # Prepare data for Logistic Regression
-        X, y = [], []
-        sequence_length = 60
-
-        for i in range(sequence_length, len(scaled_data)):
-            X.append(scaled_data[i-sequence_length:i].flatten())
-            y.append(1 if i < len(scaled_data)-1 and 
-                     scaled_data[i+1, close_index] > scaled_data[i, close_index] else 0)
-
-        X, y = np.array(X), np.array(y)
-
-        # Split into train and test sets
-        train_size = int(len(X) * 0.8)
-        X_train, X_test = X[:train_size], X[train_size:]
-        y_train, y_test = y[:train_size], y[train_size:]
-
-        # Define and train the Logistic Regression model
-        model = LogisticRegression(max_iter=1000, random_state=42, C=1.0)
-        model.fit(X_train, y_train)
-
-        # Predictions
-        train_pred = model.predict(X_train)
-        test_pred = model.predict(X_test)
-
-        # Accuracy Scores
-        train_accuracy = accuracy_score(y_train, train_pred)
-        test_accuracy = accuracy_score(y_test, test_pred)
-
-        # Regression Metrics
-        train_mse = mean_squared_error(y_train, train_pred)
-        test_mse = mean_squared_error(y_test, test_pred)
-
-        train_rmse = np.sqrt(train_mse)
-        test_rmse = np.sqrt(test_mse)
-
-        train_mae = mean_absolute_error(y_train, train_pred)
-        test_mae = mean_absolute_error(y_test, test_pred)
-
-        # Convert predictions to price movements
-        last_close = close_prices[-1][0]
-        avg_price_change = np.mean(np.abs(df['Price_Change'].dropna())) * last_close
-
-        # Predict future prices
-        future_predictions = []
-        current_sequence = scaled_data[-sequence_length:].flatten().reshape(1, -1)
-        predicted_prices = [last_close]
-
-        for i in range(days):
-            direction = model.predict(current_sequence)[0]
-            price_change = avg_price_change if direction == 1 else -avg_price_change
-            next_price = predicted_prices[-1] + price_change
-            predicted_prices.append(next_price)
-
-            # Update sequence with new prediction
-            new_point = current_sequence[0][-df.shape[1]:].copy()
-            new_scaled_price = close_scaler.transform([[next_price]])[0][0]
-            new_point[close_index] = new_scaled_price
-
-            current_sequence = np.roll(current_sequence, -df.shape[1])
-            current_sequence[0][-df.shape[1]:] = new_point
+        df = prepare_features(data, engine)
+        sequence_length = ENGINES[engine]["sequence_length"]
+
+        # Reuse the registered model, a stale one is retrained in the background
+        registered = registered_model(symbol, engine, df, sequence_length, f"{forecast_engines[engine]} model")
+        if registered is None:
+            st.write("### Recent Closing Prices")
+            st.line_chart(df['Close'][-60:])
+            return None
+        model, artifacts, metrics = registered
 
-        predicted_prices = np.array(predicted_prices[1:])  # Remove initial actual price
+        # Predict future prices, the longest forecast is made once per model and bar and sliced to days
+        predicted_prices = cached_forecast(symbol, engine, model, artifacts, df, sequence_length, days)
 
-        ticker = yf.Ticker(symbol)
         currency_symbol = "₹" if symbol.endswith(".NS") else "$"
 
         try:
-            current_market_price = ticker.info.get('currentPrice', None)
+            current_market_price = get_ticker_info(symbol, ["currentPrice"]).get('currentPrice', None)
             latest_close = df['Close'].iloc[-1]
 
             if current_market_price and not pd.isna(current_market_price):
@@ -488,11 +380,11 @@ def gyaani_baba_prediction(symbol, days=120):
             # 📊 Model Metrics
             print("\n### 📊 Model Performance Metrics:")
             print("--------------------------------------------------")
-            print(f"✔️ Training Accuracy Score: {train_accuracy:.4f}")
-            print(f"✔️ Testing Accuracy Score: {test_accuracy:.4f}")
-            print(f"📈 Train RMSE: {train_rmse:.4f} | Test RMSE: {test_rmse:.4f}")
-            print(f"📉 Train MSE: {train_mse:.4f}  | Test MSE: {test_mse:.4f}")
-            print(f"📊 Train MAE: {train_mae:.4f}  | Test MAE: {test_mae:.4f}")
+            print(f"✔️ Training Accuracy Score: {metrics['train_accuracy']:.4f}")
+            print(f"✔️ Testing Accuracy Score: {metrics['test_accuracy']:.4f}")
+            print(f"📈 Train RMSE: {metrics['train_rmse']:.4f} | Test RMSE: {metrics['test_rmse']:.4f}")
+            print(f"📉 Train MSE: {metrics['train_mse']:.4f}  | Test MSE: {metrics['test_mse']:.4f}")
+            print(f"📊 Train MAE: {metrics['train_mae']:.4f}  | Test MAE: {metrics['test_mae']:.4f}")
             print(f"✔️ Calibration Factor: {calibration_factor:.4f}")
 
             return calibrated_predictions
@@ -517,9 +409,9 @@ if option == "Overall Market Status":
 
 elif option == "Current Price":
     symbol = st.sidebar.selectbox("Select Stock", stock_symbols)
-    ticker = yf.Ticker(symbol)
+    info = get_ticker_info(symbol, ["currentPrice"])
     currency_symbol = "₹" if symbol.endswith(".NS") else "$"  # Check if it's an Indian stock
-    st.write(f"Current Price of {symbol} : {currency_symbol}{ticker.info.get('currentPrice', 'N/A')}")
+    st.write(f"Current Price of {symbol} : {currency_symbol}{info.get('currentPrice', 'N/A')}")
     fetch_news_sentiment(symbol)
 
 elif option == "Price Between Dates":
@@ -550,7 +442,7 @@ elif option == "Stock Comparison":
     start_date = st.sidebar.date_input("Start Date")
     end_date = st.sidebar.date_input("End Date")
     
-    data = {symbol: fetch_stock_data(symbol, start_date, end_date) for symbol in symbols}
+    data = fetch_stock_data_batch(symbols, start_date, end_date)
 
     if all(not df.empty for df in data.values()):
         st.write("Stock Comparison:")
@@ -573,7 +465,15 @@ elif option == "Stock Comparison":
             
 
 elif option == "Time Series Analysis":
-    symbol = st.sidebar.selectbox("Select Stock", stock_symbols)
+    # Nothing is computed until the user asks for it
+    with st.sidebar.form("time_series_inputs"):
+        symbol = st.selectbox("Select Stock", stock_symbols)
+        if st.form_submit_button("Run"):
+            st.session_state["time_series_run"] = symbol
+    if "time_series_run" not in st.session_state:
+        st.info("Select a stock and press Run to analyse it.")
+        st.stop()
+    symbol = st.session_state["time_series_run"]
     data = fetch_stock_data(symbol, datetime.date.today() - pd.DateOffset(years=5), datetime.date.today())
 
     if not data.empty:
@@ -584,177 +484,66 @@ elif option == "Time Series Analysis":
         close_col = ('Close', symbol) if ('Close', symbol) in data.columns else 'Close'  # Fallback to 'Close' if no multi-index
         close_prices = data[close_col]
 
+        # Results are kept for the session until the symbol or its bars change
+        inputs = (symbol, close_prices.index[0], close_prices.index[-1])
+
         # 1. Basic Plot of Closing Prices
         st.write("#### Historical Closing Prices")
-        # Create a DataFrame with explicit columns to avoid length mismatch
-        plot_data = pd.DataFrame({
-            'Date': data.index,
-            'Close': data[close_col]
-        })
-        fig = px.line(plot_data, x='Date', y='Close', title=f"{symbol} Closing Price Over Time")
-        fig.update_xaxes(title_text="Date")
-        fig.update_yaxes(title_text="Closing Price")
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(session_result("ts_prices", inputs, build_price_figure, symbol, close_prices), use_container_width=True)
 
         # 2. Trend Decomposition
         st.write("#### Trend Decomposition")
         try:
-            decomposition = seasonal_decompose(close_prices, model='additive', period=252)  # 252 trading days ~ 1 year
-            trend = decomposition.trend
-            seasonal = decomposition.seasonal
-            residual = decomposition.resid
-
-            fig_decomp = go.Figure()
-            fig_decomp.add_trace(go.Scatter(x=close_prices.index, y=close_prices, mode='lines', name='Original'))
-            fig_decomp.add_trace(go.Scatter(x=trend.index, y=trend, mode='lines', name='Trend'))
-            fig_decomp.add_trace(go.Scatter(x=seasonal.index, y=seasonal, mode='lines', name='Seasonal'))
-            fig_decomp.add_trace(go.Scatter(x=residual.index, y=residual, mode='lines', name='Residual'))
-            fig_decomp.update_layout(
-                title=f"{symbol} Time Series Decomposition",
-                xaxis_title="Date",
-                yaxis_title="Value",
-                template="plotly_dark",
-                height=600
-            )
+            fig_decomp = session_result("ts_decomposition", inputs, build_decomposition_figure, symbol, close_prices)
             st.plotly_chart(fig_decomp, use_container_width=True)
         except Exception as e:
             st.warning(f"Could not decompose series: {str(e)}")
 
         # 3. Stationarity Test (ADF)
         st.write("#### Stationarity Test (Augmented Dickey-Fuller)")
-        adf_result = adfuller(close_prices.dropna())
+        adf_result = session_result("ts_adf", inputs, adfuller, close_prices.dropna())
         st.write(f"ADF Statistic: {adf_result[0]:.4f}")
         st.write(f"p-value: {adf_result[1]:.4f}")
         st.write("Interpretation: " + ("Stationary" if adf_result[1] < 0.05 else "Non-Stationary"))
 
         # 4. Autocorrelation Analysis
         st.write("#### Autocorrelation Function (ACF)")
-        acf_values = acf(close_prices.dropna(), nlags=40)
-        fig_acf = go.Figure()
-        fig_acf.add_trace(go.Bar(x=np.arange(len(acf_values)), y=acf_values, name='ACF'))
-        fig_acf.update_layout(
-            title=f"{symbol} Autocorrelation",
-            xaxis_title="Lag",
-            yaxis_title="Autocorrelation",
-            template="plotly_dark",
-            height=400
-        )
-        st.plotly_chart(fig_acf, use_container_width=True)
+        st.plotly_chart(session_result("ts_acf", inputs, build_acf_figure, symbol, close_prices), use_container_width=True)
 
         # 5. LSTM Forecasting
         st.write("#### LSTM Forecast (30 Days Ahead)")
         try:
-            # Prepare data for LSTM
-            scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled_data = scaler.fit_transform(close_prices.values.reshape(-1, 1))
-
-            # Create sequences
-            sequence_length = 60
-            X, y = [], []
-            for i in range(sequence_length, len(scaled_data)):
-                X.append(scaled_data[i-sequence_length:i])
-                y.append(scaled_data[i])
-            X, y = np.array(X), np.array(y)
-
-            # Split into train and test sets
-            train_size = int(len(X) * 0.8)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-
-            # Define LSTM model
-            model = Sequential([
-                LSTM(units=50, return_sequences=True, input_shape=(X_train.shape[1], 1)),
-                Dropout(0.2),
-                LSTM(units=50, return_sequences=False),
-                Dropout(0.2),
-                Dense(units=25),
-                Dense(units=1)
-            ])
-
-            # Compile and train
-            model.compile(optimizer='adam', loss='mean_squared_error')
-            history = model.fit(X_train, y_train, epochs=20, batch_size=32, validation_split=0.1, verbose=0)
-
-            # Model Performance Metrics
-            test_pred = model.predict(X_test).flatten()
-            train_pred = model.predict(X_train).flatten()
-        
-            # Define close_scaler before using it
-            close_scaler = MinMaxScaler(feature_range=(0, 1))
-            close_scaler.fit(close_prices.values.reshape(-1, 1))
-        
-            # Inverse transform for metrics
-            train_pred_inv = close_scaler.inverse_transform(train_pred.reshape(-1, 1)).flatten()
-            test_pred_inv = close_scaler.inverse_transform(test_pred.reshape(-1, 1)).flatten()
-            y_train_inv = close_scaler.inverse_transform(y_train.reshape(-1, 1)).flatten()
-            y_test_inv = close_scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
-
-            # Now calculate real-world metrics
-            train_mae = np.mean(np.abs(y_train_inv - train_pred_inv))
-            test_mae = np.mean(np.abs(y_test_inv - test_pred_inv))
-            train_rmse = np.sqrt(np.mean((y_train_inv - train_pred_inv) ** 2))
-            test_rmse = np.sqrt(np.mean((y_test_inv - test_pred_inv) ** 2))
-
-
-            # Evaluate model on training data
-            y_train_pred = model.predict(X_train, verbose=0)
-            train_r2 = r2_score(y_train, y_train_pred)
-            train_mape = np.mean(np.abs((y_train - y_train_pred) / y_train)) * 100
-
-            # Evaluate model on testing data
-            y_test_pred = model.predict(X_test, verbose=0)
-            test_r2 = r2_score(y_test, y_test_pred)
-            test_mape = np.mean(np.abs((y_test - y_test_pred) / y_test)) * 100
-
-           # Display performance metrics
-            st.write("### Model Performance Metrics")
-            st.write("#### Training Data")
-            st.write(f"Mean Squared Error (MSE): {train_mae:.4f}")
-            st.write(f"Root Mean Squared Error (RMSE): {train_rmse:.4f}")
-            st.write(f"Mean Absolute Error (MAE): {train_mae:.4f}")
-            st.write(f"R-squared (R²): {train_r2:.4f}")
-            st.write(f"Mean Absolute Percentage Error (MAPE): {train_mape:.2f}%")
-
-            st.write("#### Testing Data")
-            st.write(f"Mean Squared Error (MSE): {test_mae:.4f}")
-            st.write(f"Root Mean Squared Error (RMSE): {test_rmse:.4f}")
-            st.write(f"Mean Absolute Error (MAE): {test_mae:.4f}")
-            st.write(f"R-squared (R²): {test_r2:.4f}")
-            st.write(f"Mean Absolute Percentage Error (MAPE): {test_mape:.2f}%")
-            
-            # Forecast 30 days ahead
-            last_sequence = scaled_data[-sequence_length:].reshape(1, sequence_length, 1)
-            future_predictions = []
-            for _ in range(30):
-                next_pred = model.predict(last_sequence, verbose=0)
-                future_predictions.append(next_pred[0, 0])
-                last_sequence = np.roll(last_sequence, -1, axis=1)
-                last_sequence[0, -1, 0] = next_pred[0, 0]
-
-            # Inverse transform predictions
-            future_predictions = np.array(future_predictions).reshape(-1, 1)
-            predicted_prices = scaler.inverse_transform(future_predictions)
-
-            # Create forecast index
-            last_date = close_prices.index[-1]
-            forecast_index = pd.date_range(start=last_date, periods=31, freq='B')[1:]  # Business days
-
-            # Plot historical data and forecast
-            fig_forecast = go.Figure()
-            fig_forecast.add_trace(go.Scatter(x=close_prices.index[-100:], y=close_prices[-100:], mode='lines', name='Historical'))
-            fig_forecast.add_trace(go.Scatter(x=forecast_index, y=predicted_prices.flatten(), mode='lines', name='LSTM Forecast', line=dict(dash='dash')))
-            fig_forecast.update_layout(
-                title=f"{symbol} 30-Day LSTM Forecast",
-                xaxis_title="Date",
-                yaxis_title="Price",
-                template="plotly_dark",
-                height=500
-            )
-            st.plotly_chart(fig_forecast, use_container_width=True)
-
-            # Display forecast values
-            forecast_df = pd.DataFrame({'Date': forecast_index, 'Forecasted Price': predicted_prices.flatten()})
-            st.write(forecast_df)
+            # The model trains in the background, the forecast shows up once it is registered
+            series = prepare_features(data, "series_lstm")
+            sequence_length = ENGINES["series_lstm"]["sequence_length"]
+            registered = registered_model(symbol, "series_lstm", series, sequence_length, "LSTM forecast model")
+            if registered is not None:
+                model, artifacts, metrics = registered
+
+                # Display performance metrics
+                st.write("### Model Performance Metrics")
+                st.write("#### Training Data")
+                st.write(f"Mean Squared Error (MSE): {metrics['train_mae']:.4f}")
+                st.write(f"Root Mean Squared Error (RMSE): {metrics['train_rmse']:.4f}")
+                st.write(f"Mean Absolute Error (MAE): {metrics['train_mae']:.4f}")
+                st.write(f"R-squared (R²): {metrics['train_r2']:.4f}")
+                st.write(f"Mean Absolute Percentage Error (MAPE): {metrics['train_mape']:.2f}%")
+
+                st.write("#### Testing Data")
+                st.write(f"Mean Squared Error (MSE): {metrics['test_mae']:.4f}")
+                st.write(f"Root Mean Squared Error (RMSE): {metrics['test_rmse']:.4f}")
+                st.write(f"Mean Absolute Error (MAE): {metrics['test_mae']:.4f}")
+                st.write(f"R-squared (R²): {metrics['test_r2']:.4f}")
+                st.write(f"Mean Absolute Percentage Error (MAPE): {metrics['test_mape']:.2f}%")
+
+                # Forecast 30 days ahead, rebuilt only when the model or the bars change
+                predicted_prices = cached_forecast(symbol, "series_lstm", model, artifacts, series, sequence_length, 30, horizon=30)
+                fig_forecast, forecast_df = session_result("ts_forecast", inputs + (id(model),), build_forecast_figure,
+                                                           symbol, close_prices, predicted_prices)
+                st.plotly_chart(fig_forecast, use_container_width=True)
+
+                # Display forecast values
+                st.write(forecast_df)
 
         except Exception as e:
             st.warning(f"Could not fit LSTM model: {str(e)}")
@@ -765,8 +554,8 @@ elif option == "Time Series Analysis":
 elif option == "Fundamental Analysis":
     symbol = st.sidebar.selectbox("Select Stock", stock_symbols)
     currency_symbol = "₹" if symbol.endswith(".NS") else "$"  # Check if it's an Indian stock
-    ticker = yf.Ticker(symbol)
-    info = ticker.info
+    info = get_ticker_info(symbol, ["marketCap", "trailingPE", "dividendYield", "trailingEps",
+                                    "fiftyTwoWeekHigh", "fiftyTwoWeekLow"])
     st.write(f"Fundamental Analysis of {symbol}:")
     st.write("--------------------------------------------------")
     st.write(f"Market Cap: {currency_symbol}{info.get('marketCap', 'N/A')}")
@@ -777,10 +566,19 @@ elif option == "Fundamental Analysis":
     st.write(f"52-Week Low: {currency_symbol}{info.get('fiftyTwoWeekLow', 'N/A')}")
 
 elif option == "Prediction (Gyaani Baba)":
-    symbol = st.sidebar.selectbox("Select Stock for Prediction", stock_symbols)
+    # Models only train once the user presses Run, the horizon slider just slices the forecast
+    with st.sidebar.form("prediction_inputs"):
+        symbol = st.selectbox("Select Stock for Prediction", stock_symbols)
+        engine = st.selectbox("Forecast Engine", list(forecast_engines), format_func=forecast_engines.get)
+        if st.form_submit_button("Run"):
+            st.session_state["prediction_run"] = (symbol, engine)
     days = st.sidebar.slider("Days to Predict", 1, 120)
-    predictions = gyaani_baba_prediction(symbol, days)
-    fetch_news_sentiment(symbol)
+    if "prediction_run" in st.session_state:
+        symbol, engine = st.session_state["prediction_run"]
+        predictions = gyaani_baba_prediction(symbol, days, engine)
+        fetch_news_sentiment(symbol)
+    else:
+        st.info("Select a stock and forecast engine, then press Run.")
 
 elif option == "Technical Analysis":
     symbol = st.sidebar.selectbox("Select Stock", stock_symbols)
@@ -0,0 +1,170 @@
+"""Page helpers shared by the dashboard apps.
+
+Streamlit reruns an app's script on every interaction, so the apps cache
+results in session state and hand model training to background jobs
+through these helpers.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from statsmodels.tsa.seasonal import seasonal_decompose
+from statsmodels.tsa.stattools import acf
+
+from market_data import get_news
+from model_registry import load_trained_model
+from training import train_and_register
+from training_jobs import forget_job, job_status, submit_job, watch_sessions, streamlit_session_id, streamlit_session_active
+
+
+def session_result(name, inputs, compute, *args):
+    """Return compute(*args), recomputed only when inputs differ from the last call under name.
+
+    Results live in this session's state, one per name, so reruns that don't
+    change a page's inputs reuse them instead of recomputing.
+    """
+    results = st.session_state.setdefault("results", {})
+    entry = results.get(name)
+    if entry is None or entry[0] != inputs:
+        entry = (inputs, compute(*args))
+        results[name] = entry
+    return entry[1]
+
+
+def score_headlines(titles):
+    """Return VADER's compound sentiment score for each headline."""
+    sentiment_analyzer = SentimentIntensityAnalyzer()
+    return [sentiment_analyzer.polarity_scores(title)['compound'] for title in titles]
+
+
+def fetch_news_sentiment(symbol):
+    """Fetch news and analyze sentiment for a given stock symbol."""
+    try:
+        news = get_news(symbol, language='en', country='IN', max_results=10)
+        titles = [article['title'] for article in news]
+        # Reruns reuse the shared articles and only rescore headlines that changed
+        sentiments = session_result("news_sentiment", (symbol, tuple(titles)), score_headlines, titles)
+
+        st.write("\nLatest News and Sentiments:")
+        st.write("--------------------------------------------------")
+
+        for title, sentiment_score in zip(titles, sentiments):
+            sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
+            st.write(f"Title: {title}\nSentiment: {sentiment_label} (Score: {sentiment_score:.2f})\n")
+
+        avg_sentiment = np.mean(sentiments) if sentiments else 0
+        overall_sentiment = "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral"
+
+        st.write("--------------------------------------------------")
+        st.write(f"Overall Sentiment: {overall_sentiment} (Score: {avg_sentiment:.2f})")
+    except Exception as e:
+        st.error(f"Error in sentiment analysis: {str(e)}")
+
+
+def build_price_figure(symbol, close_prices):
+    """Build the closing price chart of the Time Series Analysis page."""
+    # Create a DataFrame with explicit columns to avoid length mismatch
+    plot_data = pd.DataFrame({
+        'Date': close_prices.index,
+        'Close': close_prices.values
+    })
+    fig = px.line(plot_data, x='Date', y='Close', title=f"{symbol} Closing Price Over Time")
+    fig.update_xaxes(title_text="Date")
+    fig.update_yaxes(title_text="Closing Price")
+    return fig
+
+
+def build_decomposition_figure(symbol, close_prices):
+    """Decompose closing prices into trend, seasonal and residual parts and plot them."""
+    decomposition = seasonal_decompose(close_prices, model='additive', period=252)  # 252 trading days ~ 1 year
+    trend = decomposition.trend
+    seasonal = decomposition.seasonal
+    residual = decomposition.resid
+
+    fig_decomp = go.Figure()
+    fig_decomp.add_trace(go.Scatter(x=close_prices.index, y=close_prices, mode='lines', name='Original'))
+    fig_decomp.add_trace(go.Scatter(x=trend.index, y=trend, mode='lines', name='Trend'))
+    fig_decomp.add_trace(go.Scatter(x=seasonal.index, y=seasonal, mode='lines', name='Seasonal'))
+    fig_decomp.add_trace(go.Scatter(x=residual.index, y=residual, mode='lines', name='Residual'))
+    fig_decomp.update_layout(
+        title=f"{symbol} Time Series Decomposition",
+        xaxis_title="Date",
+        yaxis_title="Value",
+        template="plotly_dark",
+        height=600
+    )
+    return fig_decomp
+
+
+def build_acf_figure(symbol, close_prices):
+    """Plot the autocorrelation of closing prices over 40 lags."""
+    acf_values = acf(close_prices.dropna(), nlags=40)
+    fig_acf = go.Figure()
+    fig_acf.add_trace(go.Bar(x=np.arange(len(acf_values)), y=acf_values, name='ACF'))
+    fig_acf.update_layout(
+        title=f"{symbol} Autocorrelation",
+        xaxis_title="Lag",
+        yaxis_title="Autocorrelation",
+        template="plotly_dark",
+        height=400
+    )
+    return fig_acf
+
+
+def build_forecast_figure(symbol, close_prices, predicted_prices):
+    """Plot the last 100 closes followed by the 30-day LSTM forecast, returning it with the forecast table."""
+    # Create forecast index
+    last_date = close_prices.index[-1]
+    forecast_index = pd.date_range(start=last_date, periods=31, freq='B')[1:]  # Business days
+
+    # Plot historical data and forecast
+    fig_forecast = go.Figure()
+    fig_forecast.add_trace(go.Scatter(x=close_prices.index[-100:], y=close_prices[-100:], mode='lines', name='Historical'))
+    fig_forecast.add_trace(go.Scatter(x=forecast_index, y=predicted_prices.flatten(), mode='lines', name='LSTM Forecast', line=dict(dash='dash')))
+    fig_forecast.update_layout(
+        title=f"{symbol} 30-Day LSTM Forecast",
+        xaxis_title="Date",
+        yaxis_title="Price",
+        template="plotly_dark",
+        height=500
+    )
+    forecast_df = pd.DataFrame({'Date': forecast_index, 'Forecasted Price': predicted_prices.flatten()})
+    return fig_forecast, forecast_df
+
+
+@st.fragment(run_every=2)
+def show_training_progress(job_key, label):
+    """Poll a background training job, rerunning the page once it has finished."""
+    status = job_status(job_key)
+    if status["state"] in ("pending", "running"):
+        message = f" ({status['message']})" if status["message"] else ""
+        st.progress(status["progress"], text=f"Training the {label}{message}, {status['elapsed']:.0f}s elapsed...")
+    else:
+        st.rerun()
+
+
+def registered_model(symbol, engine, df, sequence_length, label):
+    """Return (model, artifacts, metrics) for symbol, training a new model in the background once it is stale.
+
+    While the new model trains, the last registered one is returned however
+    old it is, or None if there is none yet.
+    """
+    registered = load_trained_model(symbol, engine, df.columns, sequence_length, df.index)
+    if registered is not None:
+        return registered
+
+    watch_sessions(streamlit_session_active)
+    job_key = (symbol, engine, sequence_length)
+    status = submit_job(job_key, streamlit_session_id(), train_and_register, symbol, engine, df, sequence_length)
+    if status["state"] == "failed":
+        forget_job(job_key)
+        st.error(f"Training the {label} for {symbol} failed: {status['error']}")
+        return None
+    show_training_progress(job_key, label)
+
+    registered = load_trained_model(symbol, engine, df.columns, sequence_length, df.index, max_new_bars=float("inf"))
+    if registered is not None:
+        st.info(f"Showing results from the previous {label} until the new one has trained.")
+    return registered
@@ -0,0 +1,168 @@
+"""Market data providers behind every yfinance and GNews call in the apps.
+
+The provider is picked with environment variables:
+
+    DATA_PROVIDER           live (default), record or replay
+    DATA_PROVIDER_DIR       directory recordings are written to and served from
+    DATA_PROVIDER_LATENCY   seconds the replay provider waits before each response
+
+Recording captures live responses while the app runs normally. Replaying them
+makes the compute paths runnable and measurable without internet access.
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from http_pool import PooledGNews, get_session
+
+DEFAULT_RECORDING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "recordings")
+MAX_NAME_SYMBOLS = 100  # Characters of symbols in a recording's file name before they are hashed
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+class YFinanceProvider:
+    """Live provider calling yfinance and GNews through the pooled HTTP session."""
+
+    def download(self, symbols, start=None, end=None, period=None, interval="1d"):
+        if period is not None:
+            return yf.download(symbols, period=period, interval=interval, progress=False, session=get_session())
+        return yf.download(symbols, start=start, end=end, interval=interval, progress=False, session=get_session())
+
+    def history(self, symbol, period):
+        return yf.Ticker(symbol, session=get_session()).history(period=period)
+
+    def info(self, symbol):
+        return yf.Ticker(symbol, session=get_session()).info
+
+    def news(self, query, **options):
+        return PooledGNews(**options).get_news(query)
+
+
+def _recording_name(method, symbols, arguments):
+    """Return the file name a call is recorded under."""
+    if isinstance(symbols, (list, tuple)):
+        symbols = "+".join(symbols)
+    symbols = symbols.replace('/', '_')
+    if len(symbols) > MAX_NAME_SYMBOLS:
+        # Keeps whole-universe downloads under file name limits, the recorded arguments still list the symbols
+        symbols = f"symbols_{hashlib.sha1(symbols.encode()).hexdigest()[:12]}"
+    digest = hashlib.sha1(repr(arguments).encode()).hexdigest()[:12]
+    return f"{method}-{symbols}-{digest}.pkl"
+
+
+class RecordingProvider:
+    """Provider that forwards to another one and saves every response to disk."""
+
+    def __init__(self, inner, directory):
+        self.inner = inner
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, method, symbols, arguments, result):
+        path = os.path.join(self.directory, _recording_name(method, symbols, arguments))
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump({"arguments": arguments, "result": result}, f)
+        os.replace(f"{path}.tmp", path)
+        return result
+
+    def download(self, symbols, start=None, end=None, period=None, interval="1d"):
+        arguments = (symbols, start, end, period, interval)
+        return self._record("download", symbols, arguments,
+                            self.inner.download(symbols, start=start, end=end, period=period, interval=interval))
+
+    def history(self, symbol, period):
+        return self._record("history", symbol, (symbol, period), self.inner.history(symbol, period))
+
+    def info(self, symbol):
+        return self._record("info", symbol, (symbol,), self.inner.info(symbol))
+
+    def news(self, query, **options):
+        arguments = (query, sorted(options.items()))
+        return self._record("news", query, arguments, self.inner.news(query, **options))
+
+
+class ReplayProvider:
+    """Offline provider serving responses saved by RecordingProvider.
+
+    Every response is delayed by latency seconds to stand in for the network.
+    A download with no exact recording is sliced out of any recording of the
+    same symbols and interval, so recorded history keeps serving later dates.
+    """
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _replay(self, method, symbols, arguments):
+        time.sleep(self.latency)
+        path = os.path.join(self.directory, _recording_name(method, symbols, arguments))
+        if not os.path.exists(path):
+            raise LookupError(f"No recorded {method} response for {symbols}")
+        return self._load(path)["result"]
+
+    def download(self, symbols, start=None, end=None, period=None, interval="1d"):
+        arguments = (symbols, start, end, period, interval)
+        try:
+            return self._replay("download", symbols, arguments)
+        except LookupError:
+            if start is None:
+                raise
+        # Fall back to the widest recording of the same symbols and interval
+        prefix = _recording_name("download", symbols, ()).rsplit("-", 1)[0]
+        recordings = [self._load(path) for path in glob.glob(os.path.join(self.directory, f"{prefix}-*.pkl"))]
+        recordings = [r["result"] for r in recordings if r["arguments"][4] == interval and not r["result"].empty]
+        if not recordings:
+            raise LookupError(f"No recorded download for {symbols}")
+        data = max(recordings, key=len)
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+    def history(self, symbol, period):
+        return self._replay("history", symbol, (symbol, period))
+
+    def info(self, symbol):
+        return self._replay("info", symbol, (symbol,))
+
+    def news(self, query, **options):
+        return self._replay("news", query, (query, sorted(options.items())))
+
+
+def _provider_from_environment():
+    """Build the provider selected by the DATA_PROVIDER environment variables."""
+    mode = os.environ.get("DATA_PROVIDER", "live")
+    directory = os.environ.get("DATA_PROVIDER_DIR", DEFAULT_RECORDING_DIR)
+    if mode == "record":
+        logging.info(f"Recording market data responses to {directory}")
+        return RecordingProvider(YFinanceProvider(), directory)
+    if mode == "replay":
+        logging.info(f"Replaying market data responses from {directory}")
+        return ReplayProvider(directory, float(os.environ.get("DATA_PROVIDER_LATENCY", "0")))
+    return YFinanceProvider()
+
+
+def get_provider():
+    """Return the process-wide data provider."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = _provider_from_environment()
+        return _provider
+
+
+def set_provider(provider):
+    """Replace the process-wide data provider, e.g. with a ReplayProvider in a benchmark."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,357 @@
+"""Local OHLCV store shared by the dashboard apps.
+
+Daily bars are kept on disk with one file per symbol. A request only goes to
+the data provider for the bars that are not already stored. The store is
+shared by the apps and the training workers, so updates to a partition hold
+a file lock as well as the per-symbol thread lock.
+"""
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from data_provider import get_provider
+from market_hours import cache_expiry, has_sessions
+from single_flight import single_flight
+
+try:
+    import pyarrow  # noqa: F401
+    STORE_FORMAT = "parquet"
+except ImportError:
+    logging.warning("pyarrow not installed, OHLCV store falls back to pickle files")
+    STORE_FORMAT = "pickle"
+
+try:
+    import fcntl
+except ImportError:
+    logging.warning("fcntl not available, OHLCV store updates are only serialised within a process")
+    fcntl = None
+
+STORE_DIR = os.environ.get(
+    "OHLCV_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "ohlcv")
+)
+
+_symbol_locks = {}
+_symbol_locks_guard = threading.Lock()
+_range_cache = {}  # symbol -> {"frame", "start", "end", "fetched_at"} shared by all sessions
+
+
+def _symbol_lock(symbol):
+    """Return the lock serialising cache and store updates for one symbol."""
+    with _symbol_locks_guard:
+        return _symbol_locks.setdefault(symbol, threading.RLock())
+
+
+@contextlib.contextmanager
+def _partition_lock(symbol):
+    """Hold a symbol's partition for a read-merge-write against other threads and processes."""
+    with _symbol_lock(symbol):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(STORE_DIR, exist_ok=True)
+        with open(os.path.join(STORE_DIR, f"{symbol.replace('/', '_')}.lock"), "a") as lock_file:
+            # Released when the file is closed
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _store_paths(symbol):
+    """Return the data and metadata file paths for a symbol's partition."""
+    name = symbol.replace("/", "_")
+    extension = "parquet" if STORE_FORMAT == "parquet" else "pkl"
+    return (os.path.join(STORE_DIR, f"{name}.{extension}"),
+            os.path.join(STORE_DIR, f"{name}.json"))
+
+
+def to_day(value):
+    """Normalise a date, datetime, Timestamp or string to a midnight Timestamp."""
+    return pd.Timestamp(value).normalize()
+
+
+def flatten_columns(data):
+    """Drop the ticker level yfinance adds to single-symbol downloads."""
+    data = data.copy()
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data.columns.name = None
+    return data
+
+
+def expand_columns(frame, symbol):
+    """Restore the (Price, Ticker) column layout the apps index with."""
+    frame = frame.copy()
+    frame.columns = pd.MultiIndex.from_product([frame.columns, [symbol]], names=["Price", "Ticker"])
+    return frame
+
+
+def slice_range(frame, start, end):
+    """Return the rows of frame in the half-open range [start, end)."""
+    if frame.empty:
+        return frame
+    return frame.loc[(frame.index >= start) & (frame.index < end)]
+
+
+def merge_frames(frames):
+    """Concatenate bar frames, keeping the newest copy of any duplicated date."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames)
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+def tail_end(end):
+    """Return the end used for tail loads, which always runs through today."""
+    return max(end, to_day(datetime.date.today()) + pd.Timedelta(days=1))
+
+
+def missing_ranges(symbol, frame, coverage, start, end):
+    """Return the (start, end) ranges that must be loaded to answer [start, end).
+
+    coverage holds the contiguous "start"/"end" range already loaded and the
+    time it was last "fetched_at". Tail loads run through today, so until the
+    symbol's market-hours expiry nothing newer than the covered range exists.
+    After it the newest bar is reloaded in case it was a partial session.
+    """
+    ranges = []
+    if start < coverage["start"]:
+        ranges.append((start, coverage["start"]))
+    last_bar = frame.index[-1] if not frame.empty else coverage["end"]
+    if time.time() >= cache_expiry(symbol, coverage["fetched_at"]):
+        needs_tail = end > last_bar
+    else:
+        # Coverage that ran past its fetch day already holds every bar that exists
+        needs_tail = end > coverage["end"] and coverage["end"] <= to_day(
+            datetime.date.fromtimestamp(coverage["fetched_at"]))
+    if needs_tail:
+        ranges.append((min(last_bar, coverage["end"]), tail_end(max(end, coverage["end"]))))
+    return ranges
+
+
+def extend_coverage(frame, coverage, ranges, loader):
+    """Load each missing range with loader and merge it into frame and coverage.
+
+    loader(range_start, range_end) returns the bars with the (start, end)
+    range they really cover, which may be narrower than asked for. Coverage
+    only grows by covered ranges that adjoin it. A range whose load fails
+    stays outside coverage, so the next request retries it instead of
+    treating the missing bars as loaded.
+    """
+    parts = [frame]
+    for range_start, range_end in ranges:
+        try:
+            part, covered_start, covered_end = loader(range_start, range_end)
+        except Exception as e:
+            logging.warning(f"Loading bars from {range_start.date()} to {range_end.date()} failed: {e}")
+            continue
+        parts.append(part)
+        if range_start < coverage["start"]:
+            if covered_start < covered_end and covered_end >= coverage["start"]:
+                coverage["start"] = min(coverage["start"], covered_start)
+        elif covered_start < covered_end and covered_start <= coverage["end"]:
+            coverage["end"] = max(coverage["end"], covered_end)
+            coverage["fetched_at"] = time.time()
+    return merge_frames(parts)
+
+
+def download_bars(symbol, start, end):
+    """Download daily bars for [start, end) with flat columns.
+
+    yfinance answers failures and rate limiting with an empty frame, so an
+    empty download for a range the market traded in raises LookupError.
+    """
+    logging.info(f"Downloading {symbol} bars from {start.date()} to {end.date()}")
+    data = get_provider().download(symbol, start=start, end=end)
+    if data.empty and has_sessions(symbol, start.date(), end.date()):
+        raise LookupError(f"No {symbol} bars returned from {start.date()} to {end.date()}")
+    return flatten_columns(data)
+
+
+def download_bars_batch(symbols, start, end):
+    """Download daily bars for several symbols in one grouped request, split per symbol."""
+    logging.info(f"Downloading {len(symbols)} symbols from {start.date()} to {end.date()}")
+    data = get_provider().download(list(symbols), start=start, end=end)
+    frames = {}
+    for symbol in symbols:
+        if data.empty or symbol not in data.columns.get_level_values(1):
+            frames[symbol] = pd.DataFrame()
+            continue
+        # Symbols trade on different calendars, so drop the other markets' days
+        frame = data.xs(symbol, axis=1, level=1).dropna(how="all")
+        frame.columns.name = None
+        frames[symbol] = frame
+    return frames
+
+
+def _read_partition(symbol):
+    """Load a symbol's stored bars and coverage metadata, or (None, None)."""
+    data_path, meta_path = _store_paths(symbol)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, None
+    try:
+        if STORE_FORMAT == "parquet":
+            frame = pd.read_parquet(data_path)
+        else:
+            frame = pd.read_pickle(data_path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except Exception as e:
+        logging.warning(f"Discarding unreadable OHLCV partition for {symbol}: {e}")
+        return None, None
+    meta["start"] = to_day(meta["start"])
+    meta["end"] = to_day(meta["end"])
+    return frame, meta
+
+
+def _write_partition(symbol, frame, meta):
+    """Atomically replace a symbol's stored bars and coverage metadata."""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    data_path, meta_path = _store_paths(symbol)
+    # Unique temporary names, so a process can't move another one's half-written file into place
+    suffix = f"{uuid.uuid4().hex}.tmp"
+    if STORE_FORMAT == "parquet":
+        frame.to_parquet(f"{data_path}.{suffix}")
+    else:
+        frame.to_pickle(f"{data_path}.{suffix}")
+    os.replace(f"{data_path}.{suffix}", data_path)
+    with open(f"{meta_path}.{suffix}", "w") as f:
+        json.dump({
+            "start": meta["start"].isoformat(),
+            "end": meta["end"].isoformat(),
+            "fetched_at": meta["fetched_at"]
+        }, f)
+    os.replace(f"{meta_path}.{suffix}", meta_path)
+
+
+def _load_from_store(symbol, start, end):
+    """Return flat daily bars for [start, end) from the on-disk store, with the range they cover.
+
+    The covered range is narrower than [start, end), or empty, when
+    downloading the missing bars failed and only stored bars are served.
+    """
+    with _partition_lock(symbol):
+        frame, meta = _read_partition(symbol)
+        if frame is None:
+            # A first load runs through today so the partition starts out complete
+            try:
+                frame = download_bars(symbol, start, tail_end(end))
+            except Exception as e:
+                # Nothing is stored, so the next request downloads again
+                logging.warning(f"Loading bars for {symbol} failed: {e}")
+                return pd.DataFrame(), start, start
+            meta = {"start": start, "end": tail_end(end), "fetched_at": time.time()}
+            _write_partition(symbol, frame, meta)
+        else:
+            ranges = missing_ranges(symbol, frame, meta, start, end)
+            if ranges:
+                # Failed ranges are left out, so what is on disk is served rather than failing the whole page
+                covered = dict(meta)
+                frame = extend_coverage(frame, meta, ranges, lambda s, e: (download_bars(symbol, s, e), s, e))
+                if meta != covered:
+                    _write_partition(symbol, frame, meta)
+    return slice_range(frame, start, end), max(start, meta["start"]), min(end, meta["end"])
+
+
+def load_ohlcv(symbol, start_date, end_date):
+    """Return daily bars for symbol in [start_date, end_date) from the local store.
+
+    The store covers one contiguous date range per symbol, and requests
+    outside it download only the missing head or tail.
+    """
+    frame, _, _ = _load_from_store(symbol, to_day(start_date), to_day(end_date))
+    return expand_columns(frame, symbol)
+
+
+def _load_from_range_cache(symbol, start, end):
+    """Return flat daily bars for [start, end) from the in-memory range cache."""
+    with _symbol_lock(symbol):
+        entry = _range_cache.get(symbol)
+        if entry is None:
+            frame, covered_start, covered_end = _load_from_store(symbol, start, end)
+            if covered_start >= covered_end:
+                # Nothing loaded, so nothing is cached and the next request tries again
+                return frame
+            entry = {"frame": frame, "start": covered_start, "end": covered_end, "fetched_at": time.time()}
+            _range_cache[symbol] = entry
+        else:
+            ranges = missing_ranges(symbol, entry["frame"], entry, start, end)
+            if ranges:
+                entry["frame"] = extend_coverage(entry["frame"], entry, ranges,
+                                                 lambda s, e: _load_from_store(symbol, s, e))
+        frame = entry["frame"]
+    return slice_range(frame, start, end)
+
+
+def get_bars(symbol, start_date, end_date):
+    """Return daily bars for symbol in [start_date, end_date) via the in-memory range cache.
+
+    Any range inside the one already cached for the symbol is sliced out of
+    memory. Wider requests only load the missing edges from the store, and
+    identical concurrent requests share a single load.
+    """
+    start, end = to_day(start_date), to_day(end_date)
+    frame = single_flight(("bars", symbol, start, end), _load_from_range_cache, symbol, start, end)
+    # expand_columns copies, so sessions never share the frame they get back
+    return expand_columns(frame, symbol)
+
+
+def _store_needs_download(symbol, start, end):
+    """Return True if answering [start, end) for symbol would hit the network."""
+    with _symbol_lock(symbol):
+        entry = _range_cache.get(symbol)
+        if entry is not None and not missing_ranges(symbol, entry["frame"], entry, start, end):
+            return False
+        frame, meta = _read_partition(symbol)
+        return frame is None or bool(missing_ranges(symbol, frame, meta, start, end))
+
+
+def _merge_into_store(symbol, downloaded, start, end):
+    """Merge bars downloaded for [start, end) into a symbol's store partition."""
+    with _partition_lock(symbol):
+        frame, meta = _read_partition(symbol)
+        if frame is None:
+            frame, meta = downloaded, {"start": start, "end": end, "fetched_at": time.time()}
+        else:
+            frame = merge_frames([frame, downloaded])
+            meta["start"] = min(meta["start"], start)
+            if end >= meta["end"]:
+                meta["end"] = end
+                meta["fetched_at"] = time.time()
+        _write_partition(symbol, frame, meta)
+
+
+def _download_into_store(symbols, start, end):
+    """Download [start, end) for symbols in one request and merge it into their partitions."""
+    for symbol, frame in download_bars_batch(symbols, start, end).items():
+        # Leave failed symbols alone so get_bars retries them on their own
+        if not frame.empty:
+            _merge_into_store(symbol, frame, start, end)
+
+
+def get_bars_batch(symbols, start_date, end_date):
+    """Return {symbol: daily bars in [start_date, end_date)} for several symbols.
+
+    Every symbol the caches cannot answer is downloaded in one grouped
+    provider request and written to its store partition. Passing the whole
+    stock universe warms the store for all of it at once.
+    """
+    start, end = to_day(start_date), to_day(end_date)
+    pending = [symbol for symbol in symbols if _store_needs_download(symbol, start, end)]
+    if pending:
+        # One window wide enough for every pending symbol's missing edges
+        batch_start, batch_end = start, tail_end(end)
+        for symbol in pending:
+            frame, meta = _read_partition(symbol)
+            for range_start, range_end in ([] if frame is None else missing_ranges(symbol, frame, meta, start, end)):
+                batch_start, batch_end = min(batch_start, range_start), max(batch_end, range_end)
+        single_flight(("batch", tuple(pending), batch_start, batch_end),
+                      _download_into_store, pending, batch_start, batch_end)
+    return {symbol: get_bars(symbol, start, end) for symbol in symbols}
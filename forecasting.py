@@ -0,0 +1,342 @@
+"""Multi-day price forecasts from trained models.
+
+Shared by the apps and the training workers. Forecasts computed by workers
+are stored in FORECAST_DIR, so the apps can serve them without running the
+model themselves.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from model_registry import read_metadata
+from single_flight import single_flight
+from tree_inference import packed_forest
+
+FORECAST_DIR = os.environ.get(
+    "FORECAST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "forecasts")
+)
+# stateful advances a copy of the LSTM one bar per forecast day, window reruns the whole window every day
+LSTM_INFERENCE = os.environ.get("LSTM_INFERENCE", "stateful")
+
+MAX_HORIZON = 120  # Longest forecast the apps ask for, shorter ones are its first days
+
+# Compiled inference functions per loaded Keras model, dropped along with the model
+_inference = weakref.WeakKeyDictionary()
+_inference_lock = threading.Lock()
+
+# Forecasts per loaded model, so a retrained or reloaded model never serves an old forecast
+_forecasts = weakref.WeakKeyDictionary()
+_forecasts_lock = threading.Lock()
+
+
+class WindowRing:
+    """Forecast state shared by the engines: a sliding window of the latest sequence_length rows, advanced in place.
+
+    Every row is written twice, sequence_length apart, into a buffer twice the
+    window's length, so the current window is always one contiguous slice in
+    model order, and pushing a row never shifts or reallocates the window.
+    """
+
+    def __init__(self, initial, dtype=np.float32):
+        self.length, n_features = initial.shape
+        self._buffer = np.empty((2 * self.length, n_features), dtype)
+        self._buffer[:self.length] = initial
+        self._buffer[self.length:] = initial
+        self._start = 0
+
+    @property
+    def window(self):
+        return self._buffer[self._start:self._start + self.length]
+
+    def latest(self):
+        return self._buffer[self._start + self.length - 1]
+
+    def push(self, row):
+        """Drop the oldest row and append row."""
+        self._buffer[self._start] = row
+        self._buffer[self._start + self.length] = row
+        self._start = (self._start + 1) % self.length
+
+    def push_latest(self, column, value):
+        """Drop the oldest row and append a copy of the latest row with column set to value."""
+        latest = self._buffer[self._start + self.length - 1]
+        for index in (self._start, self._start + self.length):
+            self._buffer[index] = latest
+            self._buffer[index, column] = value
+        self._start = (self._start + 1) % self.length
+
+
+def _compile_forward(model):
+    """Return a compiled batch-of-one forward pass, skipping predict()'s per-call setup."""
+    import tensorflow as tf
+
+    signature = [tf.TensorSpec((1,) + tuple(model.input_shape[1:]), tf.float32)]
+    # A weak reference, so the cache entry doesn't keep its own key alive
+    model_ref = weakref.ref(model)
+    return tf.function(lambda inputs: model_ref()(inputs, training=False), input_signature=signature)
+
+
+def _inference_for(model):
+    """Return the cached inference functions of model, compiling its forward pass on first use."""
+    with _inference_lock:
+        entry = _inference.get(model)
+        if entry is None:
+            entry = {"forward": _compile_forward(model), "stateful": None, "lock": threading.Lock()}
+            _inference[model] = entry
+        return entry
+
+
+def _reset_states(model):
+    for layer in model.layers:
+        if getattr(layer, "stateful", False):
+            # Keras 3 renamed reset_states to reset_state
+            reset = getattr(layer, "reset_state", None) or layer.reset_states
+            reset()
+
+
+def stateful_copy(model):
+    """Return a stateful copy of a Sequential LSTM model, sharing its trained weights, for batches of one.
+
+    Feeding it the history window once and then one bar at a time carries the
+    LSTM state forward, instead of pushing the whole window through per step.
+    """
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(batch_shape=(1, None, model.input_shape[-1]))
+    outputs = inputs
+    for layer in model.layers:
+        config = layer.get_config()
+        config.pop("batch_input_shape", None)
+        config.pop("input_shape", None)
+        if isinstance(layer, tf.keras.layers.LSTM):
+            config["stateful"] = True
+        outputs = type(layer).from_config(config)(outputs)
+    stateful = tf.keras.Model(inputs, outputs)
+    stateful.set_weights(model.get_weights())
+    return stateful
+
+
+def forecast_stateful(model, scaled_data, close_index, sequence_length, days):
+    """Forecast days bars with a stateful copy of an LSTM model. Returns scaled closes.
+
+    The last sequence_length bars prime the state and give the first
+    prediction, which matches the windowed forecast. Every further day feeds
+    only the newest bar: the last real bar with its close replaced by the
+    previous prediction, as in forecast_lstm.
+    """
+    window = scaled_data[-sequence_length:].reshape(1, sequence_length, scaled_data.shape[1]).astype(np.float32)
+    new_point = window[:, -1:, :].copy()
+    future_predictions = np.empty(days)
+    entry = _inference_for(model)
+    # The copy's state is shared, so one forecast at a time per model
+    with entry["lock"]:
+        if entry["stateful"] is None:
+            stateful = stateful_copy(model)
+            entry["stateful"] = (stateful, _compile_forward(stateful))
+        stateful, step = entry["stateful"]
+        _reset_states(stateful)
+        for day in range(days):
+            next_pred = step(window if day == 0 else new_point).numpy()[0, 0]
+            future_predictions[day] = next_pred
+            new_point[0, 0, close_index] = next_pred
+    return future_predictions
+
+
+def forecast_lstm(model, scaled_data, close_index, sequence_length, days):
+    """Roll the LSTM forward days bars, feeding each predicted close back in. Returns scaled closes."""
+    forward = _inference_for(model)["forward"]
+    ring = WindowRing(scaled_data[-sequence_length:])
+    future_predictions = np.empty(days)
+
+    for day in range(days):
+        next_pred = forward(ring.window[np.newaxis]).numpy()[0, 0]
+        future_predictions[day] = next_pred
+        ring.push_latest(close_index, next_pred)
+    return future_predictions
+
+
+def forecast_direction(model, scaled_data, close_scaler, close_index, sequence_length, last_close,
+                       avg_price_change, days):
+    """Step the price by avg_price_change in the direction the classifier predicts, days times."""
+    ring = WindowRing(scaled_data[-sequence_length:], scaled_data.dtype)
+    predicted_prices = [last_close]
+    # The packed forest scores a row without predict()'s per-call joblib dispatch
+    predict = packed_forest(model).predict if isinstance(model, RandomForestRegressor) else model.predict
+    # close_scaler.transform of a single price, without its per-call validation
+    close_scale, close_offset = close_scaler.scale_[0], close_scaler.min_[0]
+
+    for i in range(days):
+        # The ring's window is contiguous, so flattening it is a view
+        direction = 1 if predict(ring.window.reshape(1, -1))[0] > 0.5 else 0
+        price_change = avg_price_change if direction == 1 else -avg_price_change
+        next_price = predicted_prices[-1] + price_change
+        predicted_prices.append(next_price)
+
+        # Update sequence with new prediction
+        ring.push_latest(close_index, next_price * close_scale + close_offset)
+
+    return np.array(predicted_prices[1:])  # Remove initial actual price
+
+
+def forecast_logistic(model, scaled_data, close_scaler, close_index, sequence_length, last_close,
+                      avg_price_change, days):
+    """forecast_direction for a linear logistic classifier, scoring each day's window without the full dot product.
+
+    Every forecast window is the latest real bars followed by copies of the
+    last real bar with the close replaced by earlier predictions. Its decision
+    function splits into the real bars' part, computed for every day up
+    front, the copies' part without their closes, a running sum over lags,
+    and the close weights of the copies' lags times the predicted closes.
+    """
+    window = scaled_data[-sequence_length:]
+    weights = model.coef_[0].reshape(sequence_length, window.shape[1])
+    close_weights = weights[:, close_index]
+
+    # Bar i of the window at lag j contributes bar_terms[i, j], so after day
+    # copies the real bars contribute the diagonal starting at row day
+    bar_terms = window @ weights.T
+    real_terms = [np.trace(bar_terms, offset=-day) for day in range(sequence_length)] + [0.0]
+    copy_point = window[-1].copy()
+    copy_point[close_index] = 0.0
+    # The copies fill the last lags, so sum the copy contributions from the newest lag back
+    copy_terms = np.concatenate([[0.0], np.cumsum((weights @ copy_point)[::-1])])
+
+    close_scale, close_offset = close_scaler.scale_[0], close_scaler.min_[0]
+    scaled_closes = np.empty(days)
+    predicted_prices = np.empty(days)
+    price = last_close
+    for day in range(days):
+        copies = min(day, sequence_length)
+        score = (model.intercept_[0] + real_terms[copies] + copy_terms[copies]
+                 + close_weights[sequence_length - copies:] @ scaled_closes[day - copies:day])
+        # The positive class, an up close, wins for a positive decision function
+        price += avg_price_change if score > 0 else -avg_price_change
+        predicted_prices[day] = price
+        scaled_closes[day] = price * close_scale + close_offset
+    return predicted_prices
+
+
+def forecast_series(model, scaled_data, sequence_length, days):
+    """Roll the single-feature Time Series Analysis LSTM forward days bars. Returns scaled closes."""
+    return forecast_lstm(model, scaled_data, 0, sequence_length, days)
+
+
+def forecast_direct(model, scaled_data, sequence_length, days):
+    """Return the first days scaled closes of a direct multi-horizon model's single forward pass."""
+    horizon = model.output_shape[-1]
+    if days > horizon:
+        raise ValueError(f"The direct model forecasts at most {horizon} days")
+    window = scaled_data[-sequence_length:][np.newaxis].astype(np.float32)
+    return _inference_for(model)["forward"](window).numpy()[0, :days]
+
+
+def forecast_prices(engine, model, artifacts, df, sequence_length, days):
+    """Return the uncalibrated predicted closes for the days bars after df."""
+    close_index = list(df.columns).index('Close')
+    if engine == "series_lstm":
+        # The series scaler was fitted on the bare close array
+        scaled_data = artifacts["scaler"].transform(df.values)
+        if LSTM_INFERENCE == "stateful":
+            future_predictions = forecast_stateful(model, scaled_data, close_index, sequence_length, days)
+        else:
+            future_predictions = forecast_series(model, scaled_data, sequence_length, days)
+        return artifacts["scaler"].inverse_transform(future_predictions.reshape(-1, 1)).flatten()
+    scaled_data = artifacts["scaler"].transform(df)
+    if engine == "lstm":
+        if LSTM_INFERENCE == "stateful":
+            future_predictions = forecast_stateful(model, scaled_data, close_index, sequence_length, days)
+        else:
+            future_predictions = forecast_lstm(model, scaled_data, close_index, sequence_length, days)
+        return artifacts["close_scaler"].inverse_transform(future_predictions.reshape(-1, 1)).flatten()
+    if engine == "direct":
+        future_predictions = forecast_direct(model, scaled_data, sequence_length, days)
+        return artifacts["close_scaler"].inverse_transform(future_predictions.reshape(-1, 1)).flatten()
+    if engine in ("random_forest", "logistic", "online_logistic"):
+        last_close = df['Close'].iloc[-1]
+        avg_price_change = np.mean(np.abs(df['Price_Change'].dropna())) * last_close
+        if engine in ("logistic", "online_logistic"):
+            return forecast_logistic(model, scaled_data, artifacts["close_scaler"], close_index, sequence_length,
+                                     last_close, avg_price_change, days)
+        return forecast_direction(model, scaled_data, artifacts["close_scaler"], close_index, sequence_length,
+                                  last_close, avg_price_change, days)
+    raise ValueError(f"Unknown engine {engine}")
+
+
+def cached_forecast(symbol, engine, model, artifacts, df, sequence_length, days, horizon=MAX_HORIZON):
+    """Return the first days of the model's horizon-day forecast from the bars in df.
+
+    Forecasts are recursive, so every shorter forecast is a prefix of the
+    longest one. That one is computed once per model and last bar, shared
+    by all sessions, or taken from the forecasts stored by training workers.
+    """
+    horizon = max(days, horizon)
+    last_bar = pd.Timestamp(df.index[-1])
+    with _forecasts_lock:
+        predicted_prices = _forecasts.get(model, {}).get((last_bar, horizon))
+    if predicted_prices is None:
+        predicted_prices = single_flight(("forecast", id(model), last_bar, horizon), _forecast_for_cache,
+                                         symbol, engine, model, artifacts, df, sequence_length, horizon)
+    return predicted_prices[:days].copy()
+
+
+def _forecast_for_cache(symbol, engine, model, artifacts, df, sequence_length, horizon):
+    predicted_prices = load_forecast(symbol, engine, df, sequence_length, horizon)
+    if predicted_prices is None:
+        predicted_prices = forecast_prices(engine, model, artifacts, df, sequence_length, horizon)
+    last_bar = pd.Timestamp(df.index[-1])
+    with _forecasts_lock:
+        # Forecasts from earlier bars are never asked for again
+        entries = {key: value for key, value in _forecasts.get(model, {}).items() if key[0] == last_bar}
+        entries[(last_bar, horizon)] = predicted_prices
+        _forecasts[model] = entries
+    return predicted_prices
+
+
+def _forecast_path(symbol, engine, sequence_length):
+    return os.path.join(FORECAST_DIR, f"{symbol.replace('/', '_')}-{engine}-{sequence_length}.joblib")
+
+
+def save_forecast(symbol, engine, df, sequence_length, predicted_prices):
+    """Store a forecast made from the registered model on the bars in df."""
+    meta = read_metadata(symbol, engine, df.columns, sequence_length)
+    if meta is None:
+        return
+    os.makedirs(FORECAST_DIR, exist_ok=True)
+    path = _forecast_path(symbol, engine, sequence_length)
+    joblib.dump({
+        "last_bar": pd.Timestamp(df.index[-1]),
+        "model_saved_at": meta["saved_at"],
+        "predicted_prices": np.asarray(predicted_prices),
+        "saved_at": time.time()
+    }, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    logging.info(f"Stored {len(predicted_prices)}-day {engine} forecast for {symbol}")
+
+
+def load_forecast(symbol, engine, df, sequence_length, days):
+    """Return the first days of a stored forecast, or None if none matches df and the registered model.
+
+    Forecasts are recursive, so the first days of a longer one are exactly
+    the shorter forecast.
+    """
+    path = _forecast_path(symbol, engine, sequence_length)
+    meta = read_metadata(symbol, engine, df.columns, sequence_length)
+    if meta is None or not os.path.exists(path):
+        return None
+    try:
+        stored = joblib.load(path)
+    except Exception as e:
+        logging.warning(f"Could not read stored {engine} forecast for {symbol}: {e}")
+        return None
+    if (stored["last_bar"] != pd.Timestamp(df.index[-1]) or stored["model_saved_at"] != meta["saved_at"]
+            or len(stored["predicted_prices"]) < days):
+        return None
+    return stored["predicted_prices"][:days]
@@ -0,0 +1,77 @@
+"""Process-wide pooled HTTP session for yfinance and GNews traffic."""
+import logging
+import threading
+import time
+
+import feedparser
+from gnews import GNews
+from gnews.utils.constants import USER_AGENT
+
+# yfinance needs a curl_cffi session to get past Yahoo's fingerprinting,
+# plain requests is only a fallback for hosts without it
+try:
+    from curl_cffi import requests as http
+    _SESSION_KWARGS = {"impersonate": "chrome"}
+except ImportError:
+    import requests as http
+    _SESSION_KWARGS = {}
+
+MAX_CONCURRENT_REQUESTS = 8  # Requests in flight at once across all sessions
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Seconds, doubled on every retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+_session = None
+_session_lock = threading.Lock()
+
+
+class PooledSession(http.Session):
+    """Keep-alive session that bounds concurrent requests and retries transient failures."""
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                with _request_slots:
+                    response = super().request(method, url, *args, **kwargs)
+            except http.exceptions.RequestException as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logging.warning(f"Request to {url} failed ({e}), retrying")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    return response
+                logging.warning(f"Request to {url} returned {response.status_code}, retrying")
+            # Sleep outside the semaphore so backing off doesn't hold a slot
+            time.sleep(BACKOFF_BASE * 2 ** attempt)
+
+
+def get_session():
+    """Return the shared pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession(**_SESSION_KWARGS)
+            if not _SESSION_KWARGS:
+                # requests keeps one connection per host unless the pool is widened
+                adapter = http.adapters.HTTPAdapter(pool_connections=MAX_CONCURRENT_REQUESTS,
+                                                    pool_maxsize=MAX_CONCURRENT_REQUESTS)
+                _session.mount("https://", adapter)
+        return _session
+
+
+class PooledGNews(GNews):
+    """GNews client that reads its RSS feeds through the shared pooled session.
+
+    Relies on the _fetch_feed hook of gnews 0.8.3 and later, older releases
+    fetch their feeds themselves.
+    """
+
+    def _fetch_feed(self, url):
+        # A browser-impersonating session sends its own matching user agent
+        headers = None if _SESSION_KWARGS else {"User-Agent": USER_AGENT}
+        response = get_session().get(url, headers=headers, proxies=getattr(self, "_proxy", None))
+        feed = feedparser.parse(response.content)
+        # GNews checks the status for rate limiting, which a feed parsed from bytes doesn't carry
+        feed["status"] = response.status_code
+        return feed
@@ -0,0 +1,161 @@
+"""SQLite job queue shared by the dashboards and any number of training workers.
+
+The database sits in data_cache (or TRAINING_QUEUE_PATH), so workers can run
+on this host or on any other host mounting the same volume. Jobs are
+pickled (function, args) pairs called as fn(job_id, *args), so a job runs
+any importable function, e.g. training.train_and_register. A claimed job
+whose worker stops sending heartbeats is handed to another worker.
+"""
+import contextlib
+import logging
+import os
+import pickle
+import sqlite3
+import time
+
+QUEUE_PATH = os.environ.get(
+    "TRAINING_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "jobs", "queue.sqlite")
+)
+STALE_AFTER = 120  # Seconds without a heartbeat before a claimed job is requeued
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    state TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    worker TEXT,
+    heartbeat_at REAL,
+    finished_at REAL,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, submitted_at);
+CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (job_key, state);
+"""
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobFailed(Exception):
+    """Raised by QueuedJob.result() for a job whose worker reported an error."""
+
+
+@contextlib.contextmanager
+def _connect(immediate=False):
+    """Open the queue database, holding the write lock throughout if immediate."""
+    os.makedirs(os.path.dirname(QUEUE_PATH), exist_ok=True)
+    # Autocommit mode, so transactions are only the explicit BEGIN ones below
+    connection = sqlite3.connect(QUEUE_PATH, timeout=30, isolation_level=None)
+    try:
+        connection.executescript(_SCHEMA)
+        if immediate:
+            connection.execute("BEGIN IMMEDIATE")
+        yield connection
+        if immediate:
+            connection.execute("COMMIT")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+class QueuedJob:
+    """Handle on a queued job with the parts of the concurrent.futures.Future interface training_jobs uses."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def _row(self):
+        with _connect() as connection:
+            return connection.execute("SELECT state, result, error FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+
+    def _state(self):
+        row = self._row()
+        return row[0] if row is not None else "cancelled"
+
+    def done(self):
+        return self._state() not in ACTIVE_STATES
+
+    def running(self):
+        return self._state() == "running"
+
+    def cancelled(self):
+        return self._state() == "cancelled"
+
+    def cancel(self):
+        """Cancel the job if no worker has claimed it yet, returning True if it won't run."""
+        with _connect(immediate=True) as connection:
+            connection.execute("UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'queued'",
+                               (time.time(), self.job_id))
+        return self.cancelled()
+
+    def exception(self):
+        row = self._row()
+        return JobFailed(row[2]) if row is not None and row[0] == "failed" else None
+
+    def result(self):
+        row = self._row()
+        if row is None or row[0] != "done":
+            raise JobFailed(row[2] if row is not None else f"Job {self.job_id} no longer exists")
+        return pickle.loads(row[1]) if row[1] is not None else None
+
+
+def enqueue(key, job_id, fn, *args):
+    """Queue fn(job_id, *args) unless a job for key is already queued or running.
+
+    Returns a QueuedJob for the new job, or for the active one with the same key.
+    """
+    job_key = repr(key)
+    with _connect(immediate=True) as connection:
+        row = connection.execute("SELECT id FROM jobs WHERE job_key = ? AND state IN (?, ?)",
+                                 (job_key, *ACTIVE_STATES)).fetchone()
+        if row is not None:
+            return QueuedJob(row[0])
+        connection.execute("INSERT INTO jobs (id, job_key, payload, state, submitted_at) VALUES (?, ?, ?, 'queued', ?)",
+                           (job_id, job_key, pickle.dumps((fn, args)), time.time()))
+    logging.info(f"Queued job {job_id} for {key}")
+    return QueuedJob(job_id)
+
+
+def claim(worker):
+    """Claim the oldest queued job for worker, returning (job_id, payload) or None if the queue is empty.
+
+    Jobs claimed by workers that have stopped sending heartbeats are requeued first.
+    """
+    now = time.time()
+    with _connect(immediate=True) as connection:
+        requeued = connection.execute(
+            "UPDATE jobs SET state = 'queued', worker = NULL WHERE state = 'running' AND heartbeat_at < ?",
+            (now - STALE_AFTER,)).rowcount
+        if requeued:
+            logging.warning(f"Requeued {requeued} jobs whose workers stopped responding")
+        row = connection.execute("SELECT id, payload FROM jobs WHERE state = 'queued' ORDER BY submitted_at LIMIT 1").fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE jobs SET state = 'running', worker = ?, heartbeat_at = ? WHERE id = ?",
+                           (worker, now, row[0]))
+    return row
+
+
+def heartbeat(job_id):
+    """Record that the worker running job_id is still alive."""
+    with _connect() as connection:
+        connection.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running'", (time.time(), job_id))
+
+
+def finish(job_id, state, result=None, error=None):
+    """Record a claimed job's outcome: state is done, failed or cancelled."""
+    with _connect() as connection:
+        connection.execute("UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = ? WHERE id = ? AND state = 'running'",
+                           (state, time.time(), pickle.dumps(result) if state == "done" else None, error, job_id))
+
+
+def queue_stats():
+    """Return the number of jobs in each state."""
+    with _connect() as connection:
+        return dict(connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
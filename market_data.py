@@ -0,0 +1,195 @@
+"""Market index and quote data shared by the dashboard apps."""
+import concurrent.futures
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from data_provider import get_provider
+from market_hours import cache_expiry
+from single_flight import single_flight
+
+SNAPSHOT_TIMEOUT = 5  # Seconds each index snapshot may take before its tile is degraded
+INTRADAY_REFRESH_INTERVAL = 300  # Seconds between intraday refreshes while a market is open
+INTRADAY_WAIT = 15  # Seconds a page waits for a symbol's first intraday bars
+QUOTE_TTL = 60  # Seconds before fast-moving ticker.info fields are revalidated in session
+FUNDAMENTALS_TTL = 6 * 3600  # Seconds before slow-moving ticker.info fields are revalidated
+INFO_MAX_STALE = 24 * 3600  # Expired ticker.info entries older than this are refetched before returning
+NEWS_TTL = 900  # Seconds news articles are shared before GNews is asked again
+
+# ticker.info fields that move with every trade, everything else is treated as fundamentals
+QUOTE_FIELDS = {
+    "currentPrice", "regularMarketPrice", "previousClose", "open",
+    "dayLow", "dayHigh", "volume", "bid", "ask"
+}
+
+_snapshot_pool = concurrent.futures.ThreadPoolExecutor(max_workers=10, thread_name_prefix="index-snapshot")
+
+# Intraday bars shared by every session, kept current by one refresher thread
+_intraday_cache = {}
+_intraday_fetched_at = {}
+_intraday_symbols = set()
+_intraday_updated = threading.Condition()
+_intraday_wakeup = threading.Event()
+_intraday_thread = None
+
+# ticker.info entries shared by every session, revalidated in the background
+_info_cache = {}
+_info_refreshing = set()
+_info_lock = threading.Lock()
+_info_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="ticker-info")
+
+# News articles per query shared by every session
+_news_cache = {}
+_news_lock = threading.Lock()
+
+
+def _fetch_snapshot(symbol):
+    """Return today's price, change and percent change for one index."""
+    data = get_provider().history(symbol, period="1d")
+    if data.empty:
+        raise ValueError("no data returned")
+    close_price = data['Close'].iloc[-1]
+    change = close_price - data['Open'].iloc[0]
+    percent_change = (change / data['Open'].iloc[0]) * 100
+    return {
+        "price": close_price,
+        "change": change,
+        "percent_change": percent_change
+    }
+
+
+def fetch_index_snapshots(indices, timeout=SNAPSHOT_TIMEOUT):
+    """Fetch snapshots for {name: symbol} indices concurrently.
+
+    Every index gets the same deadline, counted from when all requests start.
+    An index that fails or misses it maps to {"degraded": True, "error": reason}
+    so one slow index can't hold up the others.
+    """
+    futures = {
+        name: _snapshot_pool.submit(single_flight, ("snapshot", symbol), _fetch_snapshot, symbol)
+        for name, symbol in indices.items()
+    }
+    deadline = time.monotonic() + timeout
+    market_data = {}
+    for name, future in futures.items():
+        try:
+            market_data[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            logging.warning(f"Snapshot for {name} missed the {timeout}s deadline")
+            market_data[name] = {"degraded": True, "error": "Timed out"}
+        except Exception as e:
+            logging.warning(f"Error fetching data for {name}: {e}")
+            market_data[name] = {"degraded": True, "error": str(e)}
+    return market_data
+
+
+def _refresh_intraday():
+    """Background loop re-downloading 5-minute bars for every registered symbol.
+
+    Symbols whose market has closed since their last refresh are skipped until
+    it opens again.
+    """
+    while True:
+        with _intraday_updated:
+            symbols = [
+                symbol for symbol in sorted(_intraday_symbols)
+                if symbol not in _intraday_fetched_at
+                or time.time() >= cache_expiry(symbol, _intraday_fetched_at[symbol], INTRADAY_REFRESH_INTERVAL)
+            ]
+        for symbol in symbols:
+            try:
+                data = get_provider().download(symbol, period='1d', interval='5m')
+            except Exception as e:
+                logging.warning(f"Intraday refresh for {symbol} failed: {e}")
+                data = None
+            with _intraday_updated:
+                if data is not None:
+                    _intraday_fetched_at[symbol] = time.time()
+                if data is not None or symbol not in _intraday_cache:
+                    # An empty frame still releases pages waiting on the first load
+                    _intraday_cache[symbol] = data if data is not None else pd.DataFrame()
+                _intraday_updated.notify_all()
+        _intraday_wakeup.wait(INTRADAY_REFRESH_INTERVAL)
+        _intraday_wakeup.clear()
+
+
+def get_intraday_bars(symbol, wait=INTRADAY_WAIT):
+    """Return today's 5-minute bars for symbol from the shared intraday cache.
+
+    The first request for a symbol registers it with the background refresher
+    and waits up to wait seconds for its first load. Pages never download
+    intraday bars themselves.
+    """
+    global _intraday_thread
+    with _intraday_updated:
+        if symbol not in _intraday_symbols:
+            _intraday_symbols.add(symbol)
+            _intraday_wakeup.set()
+        if _intraday_thread is None:
+            _intraday_thread = threading.Thread(target=_refresh_intraday, name="intraday-refresher", daemon=True)
+            _intraday_thread.start()
+        _intraday_updated.wait_for(lambda: symbol in _intraday_cache, timeout=wait)
+        data = _intraday_cache.get(symbol)
+    # Callers add columns and shift the index, so hand out a copy
+    return data.copy() if data is not None else pd.DataFrame()
+
+
+def _refresh_info(symbol):
+    """Fetch ticker.info for symbol and store it in the shared cache."""
+    try:
+        info = get_provider().info(symbol)
+        with _info_lock:
+            _info_cache[symbol] = {"info": info, "fetched_at": time.time()}
+        return info
+    finally:
+        with _info_lock:
+            _info_refreshing.discard(symbol)
+
+
+def get_ticker_info(symbol, fields=("currentPrice",)):
+    """Return ticker.info for symbol from the shared cache.
+
+    The entry's lifetime depends on the fields the caller reads. If any is in
+    QUOTE_FIELDS it expires QUOTE_TTL into a session or at the next open of
+    the symbol's market, otherwise after FUNDAMENTALS_TTL. An expired entry is
+    still returned straight away while a background refresh replaces it, so a
+    page only ever waits on the first lookup of a symbol.
+    """
+    with _info_lock:
+        entry = _info_cache.get(symbol)
+        age = time.time() - entry["fetched_at"] if entry else None
+        if entry is None:
+            expired = True
+        elif QUOTE_FIELDS.intersection(fields):
+            expired = time.time() >= cache_expiry(symbol, entry["fetched_at"], QUOTE_TTL)
+        else:
+            expired = age > FUNDAMENTALS_TTL
+        if entry and expired and age <= INFO_MAX_STALE and symbol not in _info_refreshing:
+            # Stale while revalidate: serve the old entry and refresh it behind the page
+            _info_refreshing.add(symbol)
+            _info_pool.submit(single_flight, ("info", symbol), _refresh_info, symbol)
+    if entry is None or (expired and age > INFO_MAX_STALE):
+        # Sessions opening the same symbol together share one ticker.info call
+        return dict(single_flight(("info", symbol), _refresh_info, symbol))
+    return dict(entry["info"])
+
+
+def _fetch_news(key, query, options):
+    """Fetch news articles for query and store them in the shared cache."""
+    news = get_provider().news(query, **options)
+    with _news_lock:
+        _news_cache[key] = {"news": news, "fetched_at": time.time()}
+    return news
+
+
+def get_news(query, **options):
+    """Return news articles for query from the shared cache, refetched once they are NEWS_TTL old."""
+    key = (query, tuple(sorted(options.items())))
+    with _news_lock:
+        entry = _news_cache.get(key)
+    if entry is None or time.time() - entry["fetched_at"] > NEWS_TTL:
+        # Sessions opening the same symbol together share one GNews call
+        return list(single_flight(("news",) + key, _fetch_news, key, query, options))
+    return list(entry["news"])
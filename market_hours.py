@@ -0,0 +1,93 @@
+"""Trading sessions used to decide how long cached market data stays valid."""
+import datetime
+import logging
+from zoneinfo import ZoneInfo
+
+try:
+    import exchange_calendars
+except ImportError:
+    logging.info("exchange_calendars not installed, market holidays are not skipped")
+    exchange_calendars = None
+
+SESSION_REFRESH_INTERVAL = 600  # Seconds cached daily bars stay valid while a session is open
+SETTLE_DELAY = datetime.timedelta(minutes=30)  # Time after the close before final bars settle
+
+MARKETS = {
+    "NSE": {"timezone": "Asia/Kolkata", "open": datetime.time(9, 15), "close": datetime.time(15, 30), "calendar": "XBOM"},
+    "JPX": {"timezone": "Asia/Tokyo", "open": datetime.time(9, 0), "close": datetime.time(15, 30), "calendar": "XTKS"},
+    "NYSE": {"timezone": "America/New_York", "open": datetime.time(9, 30), "close": datetime.time(16, 0), "calendar": "XNYS"}
+}
+
+# Index symbols carry no exchange suffix, so map them explicitly
+INDEX_MARKETS = {
+    "^NSEI": "NSE",
+    "^BSESN": "NSE",
+    "^NSEBANK": "NSE",
+    "^N225": "JPX",
+    "^DJI": "NYSE"
+}
+
+_calendars = {}
+
+
+def market_for(symbol):
+    """Return the market a symbol trades on, using the suffix check behind currency_symbol."""
+    if symbol in INDEX_MARKETS:
+        return INDEX_MARKETS[symbol]
+    if symbol.endswith(".NS") or symbol.endswith(".BO"):
+        return "NSE"
+    if symbol.endswith(".T"):
+        return "JPX"
+    return "NYSE"
+
+
+def is_session(market, day):
+    """Return True if market trades on day, skipping holidays when exchange_calendars is installed."""
+    if day.weekday() >= 5:
+        return False
+    if exchange_calendars is None:
+        return True
+    code = MARKETS[market]["calendar"]
+    try:
+        if code not in _calendars:
+            _calendars[code] = exchange_calendars.get_calendar(code)
+        return bool(_calendars[code].is_session(day.isoformat()))
+    except Exception as e:
+        # Dates outside the calendar's range are treated as plain weekdays
+        logging.debug(f"Calendar lookup for {code} on {day} failed: {e}")
+        return True
+
+
+def has_sessions(symbol, start, end):
+    """Return True if symbol's market traded on any day in [start, end) before today."""
+    market = market_for(symbol)
+    day, last = start, min(end, datetime.date.today())
+    while day < last:
+        if is_session(market, day):
+            return True
+        day += datetime.timedelta(days=1)
+    return False
+
+
+def cache_expiry(symbol, fetched_at, session_ttl=SESSION_REFRESH_INTERVAL):
+    """Return the epoch time until which data for symbol fetched at fetched_at stays valid.
+
+    While the symbol's market is in session, and for SETTLE_DELAY after the
+    close, data expires after session_ttl seconds. Otherwise nothing can
+    change before the next session opens, so that is when it expires.
+    """
+    market = market_for(symbol)
+    hours = MARKETS[market]
+    tz = ZoneInfo(hours["timezone"])
+    fetched = datetime.datetime.fromtimestamp(fetched_at, tz)
+    for offset in range(15):
+        day = fetched.date() + datetime.timedelta(days=offset)
+        if not is_session(market, day):
+            continue
+        session_open = datetime.datetime.combine(day, hours["open"], tz)
+        session_settled = datetime.datetime.combine(day, hours["close"], tz) + SETTLE_DELAY
+        if fetched < session_open:
+            return session_open.timestamp()
+        if fetched < session_settled:
+            return fetched_at + session_ttl
+    return fetched_at + session_ttl
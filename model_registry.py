@@ -0,0 +1,187 @@
+"""Persistent registry of trained prediction models.
+
+Models are saved per (symbol, engine, feature set, sequence length) together
+with the fitted scalers and the date of the last bar they were trained on.
+Predictions reuse a saved model until too many new bars have arrived.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import joblib
+import pandas as pd
+
+MODEL_DIR = os.environ.get(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "models")
+)
+RETRAIN_AFTER_BARS = int(os.environ.get("MODEL_RETRAIN_AFTER_BARS", "5"))  # New bars before a model is stale
+# Budget for loaded models, measured by their file sizes. That undercounts Keras models in memory, and
+# the stateful copies and compiled functions forecasting attaches to them aren't counted at all
+MODEL_CACHE_BYTES = int(os.environ.get("MODEL_CACHE_BYTES", str(512 * 1024 ** 2)))
+
+# Deserialised models shared by every session, least recently used first
+_loaded_models = collections.OrderedDict()
+_loaded_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def entry_dir(symbol, engine, features, sequence_length):
+    """Return the directory a model is registered under."""
+    feature_hash = hashlib.sha1(",".join(features).encode()).hexdigest()[:10]
+    return os.path.join(MODEL_DIR, f"{symbol.replace('/', '_')}-{engine}-{feature_hash}-{sequence_length}")
+
+
+def _is_keras_model(model):
+    """Return True for Keras models, which need Keras' own serialisation."""
+    return type(model).__module__.split(".")[0] in ("keras", "tensorflow", "tf_keras")
+
+
+def _replace_with(path, writer):
+    """Write a file through writer(tmp_path) and move it into place atomically."""
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{extension}"
+    writer(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _entry_bytes(path, meta):
+    """Estimate a loaded model's memory footprint from its serialised size."""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in (meta["model_file"], "artifacts.joblib"))
+
+
+def _forget_models(path):
+    """Drop every loaded version of the model registered under path. Call with _loaded_lock held."""
+    for cached_key in [cached_key for cached_key in _loaded_models if cached_key[0] == path]:
+        _cache_stats["bytes"] -= _loaded_models.pop(cached_key)[1]
+
+
+def _cache_model(key, entry, size):
+    """Insert a loaded model into the LRU and evict until it fits MODEL_CACHE_BYTES.
+
+    Versions of the model saved earlier under the same path are dropped, as
+    they are never loaded again.
+    """
+    with _loaded_lock:
+        _forget_models(key[0])
+        if size > MODEL_CACHE_BYTES:
+            return
+        _loaded_models[key] = (entry, size)
+        _cache_stats["bytes"] += size
+        while _cache_stats["bytes"] > MODEL_CACHE_BYTES:
+            evicted_key, (_, evicted_size) = _loaded_models.popitem(last=False)
+            _cache_stats["bytes"] -= evicted_size
+            _cache_stats["evictions"] += 1
+            logging.info(f"Evicted model {os.path.basename(evicted_key[0])} from the model cache")
+
+
+def _cached_model(key):
+    """Return a loaded model from the LRU and count the hit or miss."""
+    with _loaded_lock:
+        if key in _loaded_models:
+            _loaded_models.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return _loaded_models[key][0]
+        _cache_stats["misses"] += 1
+        return None
+
+
+def model_cache_stats():
+    """Return hit, miss and eviction counts plus the size of the loaded-model cache."""
+    with _loaded_lock:
+        return dict(_cache_stats, entries=len(_loaded_models), budget=MODEL_CACHE_BYTES)
+
+
+def read_metadata(symbol, engine, features, sequence_length):
+    """Return the metadata of a registered model, or None if there is none."""
+    meta_path = os.path.join(entry_dir(symbol, engine, features, sequence_length), "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def new_bars_since(meta, bar_dates):
+    """Return how many of bar_dates are newer than the model's last training bar."""
+    return int((pd.DatetimeIndex(bar_dates) > pd.Timestamp(meta["trained_through"])).sum())
+
+
+def save_trained_model(symbol, engine, features, sequence_length, model, artifacts, trained_through, metrics=None):
+    """Register a trained model with its artifacts (e.g. scalers) and evaluation metrics."""
+    features = list(features)
+    path = entry_dir(symbol, engine, features, sequence_length)
+    os.makedirs(path, exist_ok=True)
+    if _is_keras_model(model):
+        model_file = "model.keras"
+        _replace_with(os.path.join(path, model_file), model.save)
+    else:
+        model_file = "model.joblib"
+        _replace_with(os.path.join(path, model_file), lambda p: joblib.dump(model, p))
+    _replace_with(os.path.join(path, "artifacts.joblib"), lambda p: joblib.dump(artifacts, p))
+
+    meta = {
+        "symbol": symbol,
+        "engine": engine,
+        "features": features,
+        "sequence_length": sequence_length,
+        "model_file": model_file,
+        "trained_through": pd.Timestamp(trained_through).isoformat(),
+        "saved_at": time.time(),
+        "metrics": {name: float(value) for name, value in (metrics or {}).items()}
+    }
+
+    def write_meta(p):
+        with open(p, "w") as f:
+            json.dump(meta, f, indent=2)
+    # Metadata goes last, so a registry entry is only visible once it is complete
+    _replace_with(os.path.join(path, "meta.json"), write_meta)
+    logging.info(f"Registered {engine} model for {symbol} trained through {meta['trained_through']}")
+    # Models are saved by training workers, which rarely serve them, so the new one is loaded where it is
+    # used rather than cached here. Earlier versions loaded in this process are dead now.
+    with _loaded_lock:
+        _forget_models(path)
+
+
+def load_trained_model(symbol, engine, features, sequence_length, bar_dates, max_new_bars=None):
+    """Return (model, artifacts, metrics) for a registered model that is still fresh.
+
+    Returns None if nothing is registered, or if bar_dates holds at least
+    max_new_bars (default RETRAIN_AFTER_BARS) bars newer than the model's
+    last training bar. Loaded models are kept in a process-wide LRU bounded
+    by MODEL_CACHE_BYTES.
+    """
+    features = list(features)
+    meta = read_metadata(symbol, engine, features, sequence_length)
+    if meta is None or meta["features"] != features:
+        return None
+    max_new_bars = RETRAIN_AFTER_BARS if max_new_bars is None else max_new_bars
+    new_bars = new_bars_since(meta, bar_dates)
+    if new_bars >= max_new_bars:
+        logging.info(f"{engine} model for {symbol} is {new_bars} bars old, retraining")
+        return None
+
+    path = entry_dir(symbol, engine, features, sequence_length)
+    key = (path, meta["saved_at"])
+    cached = _cached_model(key)
+    if cached is not None:
+        return cached
+    try:
+        if meta["model_file"].endswith(".keras"):
+            from tensorflow.keras.models import load_model
+            model = load_model(os.path.join(path, meta["model_file"]))
+        else:
+            model = joblib.load(os.path.join(path, meta["model_file"]))
+        artifacts = joblib.load(os.path.join(path, "artifacts.joblib"))
+    except Exception as e:
+        logging.warning(f"Could not load {engine} model for {symbol}, retraining: {e}")
+        return None
+    entry = (model, artifacts, meta["metrics"])
+    _cache_model(key, entry, _entry_bytes(path, meta))
+    stats = model_cache_stats()
+    logging.info(f"Model cache: {stats['hits']} hits, {stats['misses']} misses, "
+                 f"{stats['bytes'] / 1024 ** 2:.1f} of {stats['budget'] / 1024 ** 2:.0f} MiB used")
+    return entry
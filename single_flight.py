@@ -0,0 +1,35 @@
+"""Request coalescing for data fetches shared across Streamlit sessions."""
+import concurrent.futures
+import threading
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def single_flight(key, fn, *args, **kwargs):
+    """Call fn(*args, **kwargs) once for all concurrent callers using the same key.
+
+    The first caller runs fn. Callers arriving while it is in flight wait for
+    that call and get the same result or exception instead of repeating it.
+    Results are shared objects, so callers must not mutate them.
+    """
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = concurrent.futures.Future()
+            _in_flight[key] = future
+    if not leader:
+        return future.result()
+
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
@@ -0,0 +1,591 @@
+"""Model training for the prediction engines and the Time Series Analysis forecast.
+
+Everything here runs inside training worker processes (see training_jobs
+and training_worker), so it must not touch Streamlit. Each trainer takes
+the feature frame and sequence length and returns (model, artifacts,
+metrics) ready for the model registry. Engines with an updater can instead
+bring a stale registered model up to date without refitting it.
+"""
+import copy
+import datetime
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score, mean_absolute_error, mean_squared_error, r2_score
+from sklearn.preprocessing import MinMaxScaler
+from ta.momentum import RSIIndicator
+from ta.trend import MACD
+
+from data_store import get_bars
+from forecasting import forecast_prices, save_forecast
+from model_registry import load_trained_model, new_bars_since, read_metadata, save_trained_model
+from tree_inference import packed_forest
+from training_jobs import TrainingCancelled, check_cancelled, report_progress
+
+# Incremental updates of a registered model before it is refitted from scratch, 0 always refits
+FULL_REFIT_EVERY = int(os.environ.get("FULL_REFIT_EVERY", "20"))
+
+# History and window length each engine is trained on, as used by the apps
+ENGINES = {
+    "lstm": {"history_years": 5, "sequence_length": 120},
+    # An update replaces update_trees of the forest's trees with ones grown on the latest update_windows windows
+    "random_forest": {"history_years": 2, "sequence_length": 60, "update_trees": 10, "update_windows": 250},
+    "logistic": {"history_years": 2, "sequence_length": 60},
+    "online_logistic": {"history_years": 2, "sequence_length": 60},  # Same features as logistic
+    "series_lstm": {"history_years": 5, "sequence_length": 60},
+    "direct": {"history_years": 5, "sequence_length": 120, "horizon": 120}  # Same features as lstm
+}
+
+
+def prepare_features(data, engine):
+    """Build the feature frame an engine trains and forecasts on from daily bars."""
+    if engine == "series_lstm":
+        close_prices = data['Close']
+        if isinstance(close_prices, pd.DataFrame):
+            close_prices = close_prices.iloc[:, 0]
+        return close_prices.to_frame('Close')
+
+    df = pd.DataFrame()
+    df['Open'] = data['Open']
+    df['High'] = data['High']
+    df['Low'] = data['Low']
+    df['Close'] = data['Close']
+    df['Volume'] = data['Volume']
+
+    # Add technical indicators
+    df['SMA_5'] = df['Close'].rolling(window=5).mean()
+    df['SMA_20'] = df['Close'].rolling(window=20).mean()
+    if engine in ("lstm", "direct"):
+        df['RSI'] = RSIIndicator(df['Close'], window=14).rsi()
+        df['MACD'] = MACD(df['Close']).macd_diff()
+
+    # Add price momentum features
+    df['Price_Change'] = df['Close'].pct_change()
+    df['Price_Change_5d'] = df['Close'].pct_change(5)
+
+    # Remove NaN values
+    return df.dropna()
+
+
+def load_features(symbol, engine):
+    """Fetch the history engine uses for symbol and build its feature frame."""
+    end_date = datetime.date.today()
+    start_date = end_date - pd.DateOffset(years=ENGINES[engine]["history_years"])
+    data = get_bars(symbol, start_date, end_date)
+    if data.empty:
+        raise LookupError(f"No data found for {symbol}")
+    return prepare_features(data, engine)
+
+
+def sliding_windows(data, sequence_length, flatten=False, dtype=np.float32):
+    """Return the sequence_length rows preceding each row of data from sequence_length on.
+
+    Same as stacking data[i-sequence_length:i] for i in range(sequence_length,
+    len(data)), but taken from a strided view of data and materialised once
+    as dtype. With dtype=None the zero-copy view itself is returned. flatten
+    turns each window into one row of sequence_length * n_features values.
+    """
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    # sliding_window_view puts the window axis last, so swap it in front of the features
+    windows = np.lib.stride_tricks.sliding_window_view(data, sequence_length, axis=0)[:-1].transpose(0, 2, 1)
+    if dtype is None:
+        if flatten:
+            raise ValueError("Flattened windows can't be a view, pass a dtype")
+        return windows
+    windows = np.ascontiguousarray(windows, dtype=dtype)
+    return windows.reshape(len(windows), -1) if flatten else windows
+
+
+def _job_progress_callback(job_id, epochs):
+    """Return a Keras callback reporting each epoch and stopping once the job is cancelled."""
+    import tensorflow as tf
+
+    class JobProgress(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            report_progress(job_id, (epoch + 1) / epochs, f"epoch {epoch + 1}/{epochs}")
+            try:
+                check_cancelled(job_id)
+            except TrainingCancelled:
+                self.model.stop_training = True
+
+    return JobProgress()
+
+
+def train_lstm(df, sequence_length, job_id=None):
+    """Train the gyaani_baba_prediction LSTM predicting the next scaled close."""
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+    close_index = list(df.columns).index('Close')
+
+    # Normalize data
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(df)
+
+    # Create sequences for LSTM
+    X = sliding_windows(scaled_data, sequence_length)
+    y = scaled_data[sequence_length:, close_index]
+
+    # Split into train and test sets
+    train_size = int(len(X) * 0.8)
+    X_train, X_test = X[:train_size], X[train_size:]
+    y_train, y_test = y[:train_size], y[train_size:]
+
+    # Define LSTM model
+    model = Sequential([
+        LSTM(128, return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])),
+        Dropout(0.3),
+        LSTM(64, return_sequences=False),
+        Dropout(0.3),
+        Dense(32, activation='relu'),
+        Dense(1)
+    ])
+
+    # Compile model
+    optimizer = tf.keras.optimizers.Adam(learning_rate=0.0003)  # Reduced learning rate
+    model.compile(optimizer=optimizer, loss='mean_squared_error')
+
+    # Train model with early stopping
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=10,
+        restore_best_weights=True
+    )
+    epochs = 30  # Increased epochs
+    model.fit(
+        X_train, y_train,
+        validation_split=0.2,  # Increased validation split
+        epochs=epochs,
+        batch_size=32,
+        callbacks=[early_stopping, _job_progress_callback(job_id, epochs)],
+        verbose=0
+    )
+    check_cancelled(job_id)
+
+    # Evaluate model
+    train_pred = model.predict(X_train, verbose=0).flatten()
+    test_pred = model.predict(X_test, verbose=0).flatten()
+
+    # Inverse transform predictions
+    close_scaler = MinMaxScaler(feature_range=(0, 1))
+    close_scaler.fit(df[['Close']])
+    train_pred_inv = close_scaler.inverse_transform(train_pred.reshape(-1, 1)).flatten()
+    test_pred_inv = close_scaler.inverse_transform(test_pred.reshape(-1, 1)).flatten()
+    y_train_inv = close_scaler.inverse_transform(y_train.reshape(-1, 1)).flatten()
+    y_test_inv = close_scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
+
+    # Calculate metrics
+    metrics = {
+        "train_mae": mean_absolute_error(y_train_inv, train_pred_inv),
+        "test_mae": mean_absolute_error(y_test_inv, test_pred_inv),
+        "train_rmse": np.sqrt(mean_squared_error(y_train_inv, train_pred_inv)),
+        "test_rmse": np.sqrt(mean_squared_error(y_test_inv, test_pred_inv)),
+        "train_r2": r2_score(y_train_inv, train_pred_inv),
+        "test_r2": r2_score(y_test_inv, test_pred_inv)
+    }
+    return model, {"scaler": scaler, "close_scaler": close_scaler}, metrics
+
+
+def train_direct(df, sequence_length, job_id=None):
+    """Train the direct multi-horizon LSTM, predicting the next horizon scaled closes in one pass."""
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+    horizon = ENGINES["direct"]["horizon"]
+    close_index = list(df.columns).index('Close')
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(df)
+    close_scaler = MinMaxScaler(feature_range=(0, 1))
+    close_scaler.fit(df[['Close']])
+
+    # Each window is paired with the horizon closes following it, so the last horizon - 1 windows have no target
+    close = scaled_data[:, close_index]
+    y = np.lib.stride_tricks.sliding_window_view(close[sequence_length:], horizon).astype(np.float32)
+    X = sliding_windows(scaled_data, sequence_length)[:len(y)]
+    if len(X) < 10:
+        raise ValueError(f"{len(df)} bars are too few to train a {horizon}-day direct model")
+
+    # Split into train and test sets
+    train_size = int(len(X) * 0.8)
+    X_train, X_test = X[:train_size], X[train_size:]
+    y_train, y_test = y[:train_size], y[train_size:]
+
+    model = Sequential([
+        LSTM(128, return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])),
+        Dropout(0.3),
+        LSTM(64, return_sequences=False),
+        Dropout(0.3),
+        Dense(128, activation='relu'),
+        Dense(horizon)
+    ])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0003), loss='mean_squared_error')
+
+    early_stopping = tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=10,
+        restore_best_weights=True
+    )
+    epochs = 30
+    model.fit(
+        X_train, y_train,
+        validation_split=0.2,
+        epochs=epochs,
+        batch_size=32,
+        callbacks=[early_stopping, _job_progress_callback(job_id, epochs)],
+        verbose=0
+    )
+    check_cancelled(job_id)
+
+    # Metrics over every forecast day, in prices
+    def to_prices(scaled):
+        return close_scaler.inverse_transform(scaled.reshape(-1, 1)).reshape(scaled.shape)
+    train_pred = to_prices(model.predict(X_train, verbose=0))
+    test_pred = to_prices(model.predict(X_test, verbose=0))
+    y_train_inv, y_test_inv = to_prices(y_train), to_prices(y_test)
+
+    # Accuracy is how often the first forecast day moves the same way as the market did
+    last_train_close = to_prices(X_train[:, -1, close_index])
+    last_test_close = to_prices(X_test[:, -1, close_index])
+    metrics = {
+        "train_accuracy": np.mean((train_pred[:, 0] > last_train_close) == (y_train_inv[:, 0] > last_train_close)),
+        "test_accuracy": np.mean((test_pred[:, 0] > last_test_close) == (y_test_inv[:, 0] > last_test_close)),
+        "train_mse": mean_squared_error(y_train_inv, train_pred),
+        "test_mse": mean_squared_error(y_test_inv, test_pred),
+        "train_mae": mean_absolute_error(y_train_inv, train_pred),
+        "test_mae": mean_absolute_error(y_test_inv, test_pred),
+        "train_r2": r2_score(y_train_inv.flatten(), train_pred.flatten()),
+        "test_r2": r2_score(y_test_inv.flatten(), test_pred.flatten())
+    }
+    metrics["train_rmse"] = np.sqrt(metrics["train_mse"])
+    metrics["test_rmse"] = np.sqrt(metrics["test_mse"])
+    return model, {"scaler": scaler, "close_scaler": close_scaler}, metrics
+
+
+def _direction_dataset(df, sequence_length):
+    """Scale df and build flattened windows labelled with the next bar's close direction."""
+    close_index = list(df.columns).index('Close')
+
+    # Normalize all data
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(df)
+
+    # Create a separate scaler just for Close prices
+    close_scaler = MinMaxScaler(feature_range=(0, 1))
+    close_scaler.fit(df[['Close']].values)
+
+    # Label each window 1 if the close rises on the bar after its target bar, the last bar never does
+    X = sliding_windows(scaled_data, sequence_length, flatten=True)
+    close = scaled_data[:, close_index]
+    y = np.append(close[1:] > close[:-1], False).astype(int)[sequence_length:]
+
+    # Split into train and test sets
+    train_size = int(len(X) * 0.8)
+    return (X[:train_size], X[train_size:], y[:train_size], y[train_size:],
+            {"scaler": scaler, "close_scaler": close_scaler})
+
+
+def _labelled_windows(scaled_data, close_index, sequence_length):
+    """Return the windows and labels of _direction_dataset, leaving out the last window whose label isn't known yet."""
+    X = sliding_windows(scaled_data, sequence_length, flatten=True)[:-1]
+    close = scaled_data[:, close_index]
+    return X, (close[1:] > close[:-1]).astype(int)[sequence_length:]
+
+
+def train_random_forest(df, sequence_length, job_id=None):
+    """Train the Random Forest scoring the probability of the close going up."""
+    X_train, X_test, y_train, y_test, artifacts = _direction_dataset(df, sequence_length)
+    report_progress(job_id, 0.1, "fitting trees")
+    check_cancelled(job_id)
+
+    # Define and train the Random Forest model
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    check_cancelled(job_id)
+    return model, dict(artifacts, updates=0), _forest_metrics(model, X_train, X_test, y_train, y_test)
+
+
+def update_random_forest(registered, df, sequence_length, new_bars, job_id=None):
+    """Bring a registered Random Forest up to date by replacing its oldest trees.
+
+    Trees are grown on the latest labelled windows, scaled with the
+    registered scalers the other trees split on, and the same number of the
+    oldest trees is retired, so the forest keeps its size.
+    """
+    model, artifacts, metrics = registered
+    if new_bars == 0:
+        return registered
+    config = ENGINES["random_forest"]
+    recent = df.iloc[-(config["update_windows"] + sequence_length + 1):]
+    X, y = _labelled_windows(artifacts["scaler"].transform(recent), list(df.columns).index('Close'), sequence_length)
+    report_progress(job_id, 0.1, f"growing {config['update_trees']} trees")
+    check_cancelled(job_id)
+
+    # Scored before the new trees see them, the windows labelled since the last save are out of sample
+    new_windows = min(new_bars, len(y))
+    update_pred = (packed_forest(model).predict(X[-new_windows:]) > 0.5).astype(int)
+    metrics = dict(metrics, update_accuracy=accuracy_score(y[-new_windows:], update_pred))
+
+    # Seeded by the last bar, so each update grows different trees
+    seed = pd.Timestamp(df.index[-1]).toordinal()
+    grower = RandomForestRegressor(n_estimators=config["update_trees"], random_state=seed, n_jobs=-1)
+    grower.fit(X, y)
+    check_cancelled(job_id)
+
+    # A copy, as the loaded model may be shared with running forecasts and their caches
+    model = copy.copy(model)
+    model.estimators_ = model.estimators_[config["update_trees"]:] + grower.estimators_
+    logging.info(f"Replaced {config['update_trees']} of {len(model.estimators_)} trees after {new_bars} new bars")
+    return model, dict(artifacts, updates=artifacts["updates"] + 1), metrics
+
+
+def _forest_metrics(model, X_train, X_test, y_train, y_test):
+    """Evaluate a Random Forest's up probabilities as direction calls and as regression."""
+    # Predictions
+    forest = packed_forest(model)
+    train_pred = forest.predict(X_train)
+    test_pred = forest.predict(X_test)
+
+    # Accuracy Scores (for classification-like evaluation)
+    train_pred_class = [1 if x > 0.5 else 0 for x in train_pred]
+    test_pred_class = [1 if x > 0.5 else 0 for x in test_pred]
+    metrics = {
+        "train_accuracy": accuracy_score(y_train, train_pred_class),
+        "test_accuracy": accuracy_score(y_test, test_pred_class),
+        "train_mse": mean_squared_error(y_train, train_pred),
+        "test_mse": mean_squared_error(y_test, test_pred),
+        "train_mae": mean_absolute_error(y_train, train_pred),
+        "test_mae": mean_absolute_error(y_test, test_pred)
+    }
+    metrics["train_rmse"] = np.sqrt(metrics["train_mse"])
+    metrics["test_rmse"] = np.sqrt(metrics["test_mse"])
+    return metrics
+
+
+def train_logistic(df, sequence_length, job_id=None):
+    """Train the Logistic Regression classifying the next close direction."""
+    X_train, X_test, y_train, y_test, artifacts = _direction_dataset(df, sequence_length)
+    report_progress(job_id, 0.1, "fitting")
+    check_cancelled(job_id)
+
+    # Define and train the Logistic Regression model
+    model = LogisticRegression(max_iter=1000, random_state=42, C=1.0)
+    model.fit(X_train, y_train)
+    check_cancelled(job_id)
+    return model, artifacts, _classifier_metrics(model, X_train, X_test, y_train, y_test)
+
+
+def train_online_logistic(df, sequence_length, job_id=None):
+    """Train the SGD logistic classifier of the next close direction that updates bar by bar."""
+    X_train, X_test, y_train, y_test, artifacts = _direction_dataset(df, sequence_length)
+    report_progress(job_id, 0.1, "fitting")
+    check_cancelled(job_id)
+
+    model = SGDClassifier(loss="log_loss", random_state=42)
+    model.fit(X_train, y_train)
+    check_cancelled(job_id)
+    return model, dict(artifacts, updates=0), _classifier_metrics(model, X_train, X_test, y_train, y_test)
+
+
+def update_online_logistic(registered, df, sequence_length, new_bars, job_id=None):
+    """Bring a registered online logistic model up to date from the windows labelled since it was saved.
+
+    Only the last new_bars + sequence_length + 1 bars are touched. The
+    scalers keep running minima and maxima, and the weights are rescaled
+    along with them, so the model scores the same before it learns the new
+    windows with partial_fit.
+    """
+    model, artifacts, metrics = registered
+    if new_bars == 0:
+        return registered
+    if new_bars + sequence_length + 1 > len(df):
+        return None
+    recent = df.iloc[-(new_bars + sequence_length + 1):]
+    close_index = list(df.columns).index('Close')
+
+    # Extend the running minima and maxima by the new bars
+    scaler, close_scaler = copy.deepcopy(artifacts["scaler"]), copy.deepcopy(artifacts["close_scaler"])
+    scaler.partial_fit(recent.iloc[-new_bars:])
+    close_scaler.partial_fit(recent[['Close']].values[-new_bars:])
+
+    # Old scaled values are ratio * new scaled values + shift, per feature and so per lag
+    ratio = artifacts["scaler"].scale_ / scaler.scale_
+    shift = artifacts["scaler"].min_ - scaler.min_ * ratio
+    model = copy.deepcopy(model)
+    model.intercept_ += model.coef_ @ np.tile(shift, sequence_length)
+    model.coef_ *= np.tile(ratio, sequence_length)
+
+    X, y = _labelled_windows(scaler.transform(recent), close_index, sequence_length)
+    check_cancelled(job_id)
+
+    # Scored before learning them, the windows are out of sample
+    metrics = dict(metrics, update_accuracy=accuracy_score(y, model.predict(X)))
+    model.partial_fit(X, y, classes=[0, 1])
+    artifacts = dict(artifacts, scaler=scaler, close_scaler=close_scaler, updates=artifacts["updates"] + 1)
+    return model, artifacts, metrics
+
+
+def _classifier_metrics(model, X_train, X_test, y_train, y_test):
+    """Evaluate a direction classifier's predicted classes."""
+    # Predictions
+    train_pred = model.predict(X_train)
+    test_pred = model.predict(X_test)
+
+    # Accuracy and Regression Metrics
+    metrics = {
+        "train_accuracy": accuracy_score(y_train, train_pred),
+        "test_accuracy": accuracy_score(y_test, test_pred),
+        "train_mse": mean_squared_error(y_train, train_pred),
+        "test_mse": mean_squared_error(y_test, test_pred),
+        "train_mae": mean_absolute_error(y_train, train_pred),
+        "test_mae": mean_absolute_error(y_test, test_pred)
+    }
+    metrics["train_rmse"] = np.sqrt(metrics["train_mse"])
+    metrics["test_rmse"] = np.sqrt(metrics["test_mse"])
+    return metrics
+
+
+def train_series_lstm(df, sequence_length, job_id=None):
+    """Train the Time Series Analysis LSTM on the Close column alone."""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+    close_prices = df['Close']
+
+    # Prepare data for LSTM
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    scaled_data = scaler.fit_transform(close_prices.values.reshape(-1, 1))
+
+    # Create sequences
+    X = sliding_windows(scaled_data, sequence_length)
+    y = scaled_data[sequence_length:]
+
+    # Split into train and test sets
+    train_size = int(len(X) * 0.8)
+    X_train, X_test = X[:train_size], X[train_size:]
+    y_train, y_test = y[:train_size], y[train_size:]
+
+    # Define LSTM model
+    model = Sequential([
+        LSTM(units=50, return_sequences=True, input_shape=(X_train.shape[1], 1)),
+        Dropout(0.2),
+        LSTM(units=50, return_sequences=False),
+        Dropout(0.2),
+        Dense(units=25),
+        Dense(units=1)
+    ])
+
+    # Compile and train
+    epochs = 20
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    model.fit(X_train, y_train, epochs=epochs, batch_size=32, validation_split=0.1, verbose=0,
+              callbacks=[_job_progress_callback(job_id, epochs)])
+    check_cancelled(job_id)
+
+    # Model Performance Metrics
+    test_pred = model.predict(X_test, verbose=0).flatten()
+    train_pred = model.predict(X_train, verbose=0).flatten()
+
+    # Define close_scaler before using it
+    close_scaler = MinMaxScaler(feature_range=(0, 1))
+    close_scaler.fit(close_prices.values.reshape(-1, 1))
+
+    # Inverse transform for metrics
+    train_pred_inv = close_scaler.inverse_transform(train_pred.reshape(-1, 1)).flatten()
+    test_pred_inv = close_scaler.inverse_transform(test_pred.reshape(-1, 1)).flatten()
+    y_train_inv = close_scaler.inverse_transform(y_train.reshape(-1, 1)).flatten()
+    y_test_inv = close_scaler.inverse_transform(y_test.reshape(-1, 1)).flatten()
+
+    # Now calculate real-world metrics
+    metrics = {
+        "train_mae": np.mean(np.abs(y_train_inv - train_pred_inv)),
+        "test_mae": np.mean(np.abs(y_test_inv - test_pred_inv)),
+        "train_rmse": np.sqrt(np.mean((y_train_inv - train_pred_inv) ** 2)),
+        "test_rmse": np.sqrt(np.mean((y_test_inv - test_pred_inv) ** 2))
+    }
+
+    # Evaluate model on training data
+    y_train_pred = train_pred.reshape(-1, 1)
+    metrics["train_r2"] = r2_score(y_train, y_train_pred)
+    metrics["train_mape"] = np.mean(np.abs((y_train - y_train_pred) / y_train)) * 100
+
+    # Evaluate model on testing data
+    y_test_pred = test_pred.reshape(-1, 1)
+    metrics["test_r2"] = r2_score(y_test, y_test_pred)
+    metrics["test_mape"] = np.mean(np.abs((y_test - y_test_pred) / y_test)) * 100
+    return model, {"scaler": scaler}, metrics
+
+
+TRAINERS = {
+    "lstm": train_lstm,
+    "random_forest": train_random_forest,
+    "logistic": train_logistic,
+    "online_logistic": train_online_logistic,
+    "series_lstm": train_series_lstm,
+    "direct": train_direct
+}
+
+# Engines whose stale models can be updated, each called with the registered
+# (model, artifacts, metrics), df, sequence_length, the number of new bars and job_id
+UPDATERS = {
+    "random_forest": update_random_forest,
+    "online_logistic": update_online_logistic
+}
+
+
+def _update_registered(symbol, engine, df, sequence_length, job_id):
+    """Return the updated (model, artifacts, metrics) of the registered model, or None if it needs a full refit."""
+    meta = read_metadata(symbol, engine, df.columns, sequence_length)
+    if engine not in UPDATERS or meta is None:
+        return None
+    registered = load_trained_model(symbol, engine, df.columns, sequence_length, df.index, max_new_bars=float("inf"))
+    if registered is None or registered[1].get("updates", FULL_REFIT_EVERY) >= FULL_REFIT_EVERY:
+        return None
+    logging.info(f"Updating {engine} model for {symbol}, update {registered[1]['updates'] + 1} of {FULL_REFIT_EVERY}")
+    return UPDATERS[engine](registered, df, sequence_length, new_bars_since(meta, df.index), job_id)
+
+
+def train_and_register(job_id, symbol, engine, df, sequence_length):
+    """Training job: train engine on df and register the model for symbol.
+
+    A stale registered model of an engine in UPDATERS is updated instead,
+    until FULL_REFIT_EVERY updates have been made since its last full fit.
+
+    Returns the evaluation metrics; the model itself is picked up from the
+    registry by whichever process needs it.
+    """
+    logging.info(f"Training {engine} model for {symbol} on {len(df)} bars")
+    report_progress(job_id, 0.0, "preparing data")
+    updated = _update_registered(symbol, engine, df, sequence_length, job_id)
+    model, artifacts, metrics = updated or TRAINERS[engine](df, sequence_length, job_id)
+    save_trained_model(symbol, engine, df.columns, sequence_length, model, artifacts, df.index[-1], metrics)
+    return metrics
+
+
+def train_symbol(job_id, symbol, engine):
+    """Training job: fetch symbol's history, then train and register engine on it."""
+    df = load_features(symbol, engine)
+    return train_and_register(job_id, symbol, engine, df, ENGINES[engine]["sequence_length"])
+
+
+def forecast_symbol(job_id, symbol, engine, days):
+    """Forecast job: store a days-bar forecast for symbol, training engine first if its model is stale."""
+    df = load_features(symbol, engine)
+    sequence_length = ENGINES[engine]["sequence_length"]
+    registered = load_trained_model(symbol, engine, df.columns, sequence_length, df.index)
+    if registered is None:
+        train_and_register(job_id, symbol, engine, df, sequence_length)
+        registered = load_trained_model(symbol, engine, df.columns, sequence_length, df.index)
+    model, artifacts, _ = registered
+    report_progress(job_id, 1.0, "forecasting")
+    predicted_prices = forecast_prices(engine, model, artifacts, df, sequence_length, days)
+    save_forecast(symbol, engine, df, sequence_length, predicted_prices)
+    return predicted_prices
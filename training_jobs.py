@@ -0,0 +1,217 @@
+"""Background training jobs, so pages never block on model.fit.
+
+Jobs run in a process pool shared by every Streamlit session, or with
+TRAINING_BACKEND=queue in standalone training workers fed through job_queue.
+Each job is started once per key; sessions asking for the same key attach
+to it, and a job is cancelled once all of its attached sessions have gone
+away. Jobs report progress and pick up cancellation through small files in
+JOB_DIR, which keeps the job functions free of any Streamlit or pool state.
+"""
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import job_queue
+
+JOB_DIR = os.environ.get(
+    "TRAINING_JOB_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_cache", "jobs")
+)
+TRAINING_BACKEND = os.environ.get("TRAINING_BACKEND", "pool")  # pool or queue
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", "2"))  # Models trained at once by the pool
+ORPHAN_CHECK_INTERVAL = 10  # Seconds between checks for jobs whose sessions have gone
+
+_executor = None
+_jobs = {}  # key -> {"id", "future", "sessions", "submitted_at"}
+_jobs_lock = threading.Lock()
+_watcher_thread = None
+
+
+class TrainingCancelled(Exception):
+    """Raised inside a training job once its cancellation has been requested."""
+
+
+def _job_file(job_id, kind):
+    return os.path.join(JOB_DIR, f"{job_id}.{kind}")
+
+
+def clear_job_files(job_id):
+    """Remove a finished job's progress and cancellation files."""
+    for kind in ("progress", "cancel"):
+        try:
+            os.remove(_job_file(job_id, kind))
+        except FileNotFoundError:
+            pass
+
+
+def report_progress(job_id, fraction, message=""):
+    """Record how far a job has got. Called from inside the worker process."""
+    if job_id is None:
+        return
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = _job_file(job_id, "progress")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"fraction": fraction, "message": message}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def check_cancelled(job_id):
+    """Raise TrainingCancelled if the job has been cancelled. Called from inside the worker process."""
+    if job_id is not None and os.path.exists(_job_file(job_id, "cancel")):
+        raise TrainingCancelled(f"Training job {job_id} was cancelled")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Spawned workers don't inherit the server's threads or TensorFlow state
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=TRAINING_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _cancel(job):
+    """Cancel a queued job outright and ask a running one to stop."""
+    if not job["future"].cancel():
+        os.makedirs(JOB_DIR, exist_ok=True)
+        open(_job_file(job["id"], "cancel"), "w").close()
+        if job["future"].done():
+            clear_job_files(job["id"])
+
+
+def _start_job(key, fn, args):
+    """Hand fn to the configured backend, returning (job_id, future)."""
+    job_id = uuid.uuid4().hex
+    if TRAINING_BACKEND == "queue":
+        # Another dashboard may already have queued the same job
+        future = job_queue.enqueue(key, job_id, fn, *args)
+        return future.job_id, future
+    future = _get_executor().submit(fn, job_id, *args)
+    future.add_done_callback(lambda _: clear_job_files(job_id))
+    return job_id, future
+
+
+def submit_job(key, session_id, fn, *args):
+    """Run fn(job_id, *args) in the background unless a job for key is already active.
+
+    The calling session is attached to the job, which is cancelled once every
+    attached session has gone (see cancel_orphaned_jobs). Jobs submitted
+    without a session_id are never cancelled that way. A failed job stays
+    registered so its error can be shown, until forget_job is called.
+    Returns the job's status as from job_status.
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and job["future"].done() and job_status(key, _locked=True)["state"] != "failed":
+            del _jobs[key]
+            job = None
+        if job is None:
+            job_id, future = _start_job(key, fn, args)
+            job = {
+                "id": job_id,
+                "future": future,
+                "sessions": set() if session_id is not None else None,
+                "submitted_at": time.time()
+            }
+            _jobs[key] = job
+            logging.info(f"Submitted training job {job_id} for {key}")
+        if session_id is not None and job["sessions"] is not None:
+            job["sessions"].add(session_id)
+        return job_status(key, _locked=True)
+
+
+def job_status(key, _locked=False):
+    """Return the state, progress and result or error of the job registered under key.
+
+    state is one of missing, pending, running, done, failed or cancelled.
+    """
+    if not _locked:
+        with _jobs_lock:
+            return job_status(key, _locked=True)
+    job = _jobs.get(key)
+    if job is None:
+        return {"state": "missing", "progress": 0.0, "message": "", "result": None, "error": None, "elapsed": 0.0}
+    future = job["future"]
+    status = {"state": "pending", "progress": 0.0, "message": "", "result": None, "error": None,
+              "elapsed": time.time() - job["submitted_at"]}
+    if future.cancelled():
+        status["state"] = "cancelled"
+    elif future.done():
+        error = future.exception()
+        if isinstance(error, TrainingCancelled):
+            status["state"] = "cancelled"
+        elif error is not None:
+            status.update(state="failed", error=str(error))
+        else:
+            status.update(state="done", progress=1.0, result=future.result())
+    else:
+        if future.running():
+            status["state"] = "running"
+        try:
+            with open(_job_file(job["id"], "progress")) as f:
+                progress = json.load(f)
+            status.update(progress=progress["fraction"], message=progress["message"])
+        except (FileNotFoundError, ValueError):
+            pass
+    return status
+
+
+def forget_job(key):
+    """Drop the job registered under key, cancelling it if it is still running."""
+    with _jobs_lock:
+        job = _jobs.pop(key, None)
+    if job is not None and not job["future"].done():
+        _cancel(job)
+
+
+def cancel_orphaned_jobs(is_session_active):
+    """Cancel unfinished jobs none of whose attached sessions is_session_active(session_id) any more."""
+    with _jobs_lock:
+        for key, job in list(_jobs.items()):
+            if job["sessions"] is None or job["future"].done():
+                continue
+            job["sessions"] = {s for s in job["sessions"] if is_session_active(s)}
+            if not job["sessions"]:
+                logging.info(f"Cancelling training job {job['id']} for {key}, its sessions have gone")
+                _cancel(job)
+                _jobs.pop(key)
+
+
+def watch_sessions(is_session_active):
+    """Start the background thread cancelling orphaned jobs, if it isn't running yet.
+
+    Sessions that have gone stop polling their jobs, so orphans are looked for
+    every ORPHAN_CHECK_INTERVAL seconds rather than on the next page run.
+    """
+    global _watcher_thread
+
+    def watch():
+        while True:
+            time.sleep(ORPHAN_CHECK_INTERVAL)
+            try:
+                cancel_orphaned_jobs(is_session_active)
+            except Exception as e:
+                logging.warning(f"Checking for orphaned training jobs failed: {e}")
+
+    with _jobs_lock:
+        if _watcher_thread is None:
+            _watcher_thread = threading.Thread(target=watch, name="training-job-watcher", daemon=True)
+            _watcher_thread.start()
+
+
+def streamlit_session_id():
+    """Return the id of the Streamlit session running the current script, or None outside Streamlit."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def streamlit_session_active(session_id):
+    """Return True while the Streamlit session with session_id is still connected."""
+    from streamlit import runtime
+    return runtime.exists() and runtime.get_instance().is_active_session(session_id)
@@ -0,0 +1,99 @@
+"""Standalone training worker running jobs from the shared job queue.
+
+Start as many as needed, on this host or on any host sharing data_cache:
+
+    python training_worker.py                      # run jobs until interrupted
+    python training_worker.py --once               # exit once the queue is empty
+    python training_worker.py schedule RELIANCE.NS TCS.NS --engine lstm --days 120
+
+Dashboards started with TRAINING_BACKEND=queue send their training jobs here
+instead of to their own process pool. The schedule command queues forecast
+jobs, which train the engine if needed and store the forecast in the shared
+artifact directory, where the dashboards pick it up.
+"""
+import argparse
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+
+import job_queue
+from training import ENGINES, forecast_symbol
+from training_jobs import TrainingCancelled, clear_job_files
+
+POLL_INTERVAL = 2  # Seconds between queue checks while it is empty
+HEARTBEAT_INTERVAL = 30  # Seconds between heartbeats, well inside job_queue.STALE_AFTER
+
+
+def run_job(job_id, payload):
+    """Run one claimed job and record its outcome in the queue."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            job_queue.heartbeat(job_id)
+
+    threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True).start()
+    try:
+        fn, args = pickle.loads(payload)
+        result = fn(job_id, *args)
+    except TrainingCancelled:
+        logging.info(f"Job {job_id} was cancelled")
+        job_queue.finish(job_id, "cancelled")
+    except Exception as e:
+        logging.exception(f"Job {job_id} failed")
+        job_queue.finish(job_id, "failed", error=str(e))
+    else:
+        job_queue.finish(job_id, "done", result=result)
+        logging.info(f"Job {job_id} done")
+    finally:
+        stop.set()
+        clear_job_files(job_id)
+
+
+def work(worker, once=False):
+    """Claim and run jobs until interrupted, or until the queue is empty if once."""
+    logging.info(f"Worker {worker} watching {job_queue.QUEUE_PATH}")
+    while True:
+        claimed = job_queue.claim(worker)
+        if claimed is None:
+            if once:
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+        logging.info(f"Worker {worker} claimed job {claimed[0]}")
+        run_job(*claimed)
+
+
+def schedule(symbols, engines, days):
+    """Queue a forecast job for every symbol and engine."""
+    for symbol in symbols:
+        for engine in engines:
+            job_queue.enqueue((symbol, engine, "forecast", days), uuid.uuid4().hex, forecast_symbol, symbol, engine, days)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}", help="worker name recorded on claimed jobs")
+    commands = parser.add_subparsers(dest="command")
+    schedule_parser = commands.add_parser("schedule", help="queue forecast jobs instead of running jobs")
+    schedule_parser.add_argument("symbols", nargs="+")
+    schedule_parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                                 help="engine to forecast with, may be repeated (default: all)")
+    schedule_parser.add_argument("--days", type=int, default=120, help="bars to forecast")
+    args = parser.parse_args()
+
+    if args.command == "schedule":
+        schedule(args.symbols, args.engine or sorted(ENGINES), args.days)
+        print(job_queue.queue_stats())
+    else:
+        work(args.name, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Flattened-array inference for fitted scikit-learn forests.
+
+RandomForestRegressor.predict pays joblib dispatch for every call, which
+dominates when the forecast loop scores one row at a time. PackedForest
+copies every tree's nodes into shared flat arrays once and walks all trees
+for all rows together with a few vectorised NumPy operations per level.
+"""
+import threading
+import weakref
+
+import numpy as np
+
+# Packed forests per fitted model, dropped along with the model
+_packed = weakref.WeakKeyDictionary()
+_packed_lock = threading.Lock()
+
+
+class PackedForest:
+    """The trees of a fitted RandomForestRegressor packed into flat node arrays."""
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        self.roots = offsets[:-1]
+        left, right = [], []
+        for tree, offset in zip(trees, offsets):
+            # Leaves point back at themselves, so every tree can take depth steps
+            own = np.arange(tree.node_count)
+            left.append(np.where(tree.children_left >= 0, tree.children_left, own) + offset)
+            right.append(np.where(tree.children_right >= 0, tree.children_right, own) + offset)
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        # Leaves have feature -2, any valid column will do since they never move
+        self.feature = np.maximum(np.concatenate([tree.feature for tree in trees]), 0)
+        self.threshold = np.concatenate([tree.threshold for tree in trees])
+        self.value = np.concatenate([tree.value[:, 0, 0] for tree in trees])
+        self.depth = max(tree.max_depth for tree in trees)
+
+    def predict(self, X):
+        """Return the forest's predictions for the rows of X, the same as model.predict(X)."""
+        # Trees compare float32 features against their thresholds, as scikit-learn does
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.tile(self.roots, (len(X), 1))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+
+def packed_forest(model):
+    """Return the PackedForest of a fitted forest, packing it on first use."""
+    with _packed_lock:
+        packed = _packed.get(model)
+        if packed is None:
+            packed = PackedForest(model)
+            _packed[model] = packed
+        return packed